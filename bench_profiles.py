@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import logging
+import time
+from profile_stub import start_stub, STUB_CODE
+import utils.helpers as helpers
+
+logger = logging.getLogger("HabsenBot")
+
+# Kullanım: python bench_profiles.py --backend http --istek 500 --eszamanli 20
+#   http      : yalnızca HTTP getirici ve ayrıştırıcı (önbellek, hız sınırı yok)
+#   selenium  : tarayıcı havuzu + sınırlı yürütücü üzerinden Selenium
+#   denetim   : check_username_validity/check_motto; önbellekler ve birleştirme dahil. Yerel sunucuda hız
+#               sınırı ve devre kesici devre dışıdır; --koruma ya da --url ile üretimdeki ayarlar kullanılır
+BACKENDS = ("http", "selenium", "denetim")
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def usernames(cases, count, unique):
+    for i in range(count):
+        case = cases[i % len(cases)]
+        yield f"{case}_{i if unique else 0}"
+
+async def check_once(backend, username):
+    if backend == "http":
+        return await helpers.read_profile(username, need_motto=True)
+    if backend == "selenium":
+        return await helpers.selenium_fetch_profile(username)
+    if await helpers.check_username_validity(username):
+        return await helpers.check_motto(username, STUB_CODE)
+    return False
+
+async def run(backend, total, concurrency, cases, unique):
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for username in usernames(cases, total, unique):
+        queue.put_nowait(username)
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            username = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                await check_once(backend, username)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "backend": backend,
+        "istek": total,
+        "hata": errors,
+        "saniyede denetim": round(total / elapsed, 1),
+        "p50 (ms)": round(percentile(latencies, 0.50) * 1000, 1),
+        "p99 (ms)": round(percentile(latencies, 0.99) * 1000, 1),
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description="Profil denetimi kıyaslaması")
+    parser.add_argument("--backend", choices=BACKENDS + ("hepsi",), default="hepsi")
+    parser.add_argument("--istek", type=int, default=200)
+    parser.add_argument("--eszamanli", type=int, default=10)
+    parser.add_argument("--durumlar", default="uye,yok,kodlu",
+                        help="Kullanıcı adı ön ekleri: uye, yok, kodlu, yavas, hata")
+    parser.add_argument("--tekrar", action="store_true", help="Aynı kullanıcı adlarını tekrar kullan (önbellek isabeti)")
+    parser.add_argument("--url", help="Yerel sunucu yerine bu HABSEN_PROFILE_URL kullanılır")
+    parser.add_argument("--koruma", action="store_true",
+                        help="Yerel sunucuda da PROFILE_RATE hız sınırı ve devre kesici uygulanır")
+    args = parser.parse_args()
+
+    runner = None
+    if args.url:
+        helpers.PROFILE_URL = args.url
+    else:
+        runner, helpers.PROFILE_URL = await start_stub()
+    if not (args.url or args.koruma):
+        # Üretimdeki saniyede 5 istek sınırı ölçümü kısıtlamasın; eşik 1'in üstünde olduğundan devre hiç açılmaz
+        helpers.profile_rate_limit = helpers.TokenBucket(rate=1e9, capacity=args.istek)
+        helpers.profile_breaker = helpers.CircuitBreaker(threshold=2)
+    backends = BACKENDS if args.backend == "hepsi" else (args.backend,)
+    try:
+        for backend in backends:
+            if backend == "selenium":
+                try:
+                    import selenium
+                except ImportError:
+                    logger.warning("selenium kurulu değil, atlandı")
+                    continue
+            result = await run(backend, args.istek, args.eszamanli, args.durumlar.split(","), not args.tekrar)
+            print("  ".join(f"{name}: {value}" for name, value in result.items()))
+    finally:
+        await helpers.close_helpers()
+        if runner:
+            await runner.cleanup()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(main())
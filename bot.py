@@ -1,8 +1,14 @@
 import discord
 from discord.ext import commands
+import asyncio
 import os
 from dotenv import load_dotenv
 import logging
+from database import Database
+from storage import StorageRouter
+from timers import TimerService
+from utils.helpers import close_helpers
+from publisher import log_publisher, dm_dispatcher
 
 logging.basicConfig(
     level=logging.ERROR,
@@ -16,12 +22,30 @@ logger = logging.getLogger("HabsenBot")
 
 load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+# Ayarlanırsa her sunucu bu klasörde kendi veritabanı dosyasını kullanır
+DATABASE_SHARD_DIR = os.getenv("DATABASE_SHARD_DIR")
+DATABASE_MAX_OPEN_SHARDS = int(os.getenv("DATABASE_MAX_OPEN_SHARDS", "32"))
 
 intents = discord.Intents.default()
 intents.guilds = True
 intents.members = True
 intents.message_content = True
 bot = commands.Bot(command_prefix='/', intents=intents)
+if DATABASE_SHARD_DIR:
+    bot.db = StorageRouter(DATABASE_SHARD_DIR, max_open=DATABASE_MAX_OPEN_SHARDS)
+else:
+    bot.db = Database("warnings.db")
+bot.timers = TimerService(bot.db)
+
+async def shutdown():
+    # Kapanışta ve /restart'ta: bekleyen log embedleri, DM'ler ve hata raporları gönderilir, veritabanı kapatılır
+    await bot.timers.stop()
+    await log_publisher.close()
+    await dm_dispatcher.close()
+    await bot.db.close()
+    await close_helpers()
+
+bot.shutdown = shutdown
 
 @bot.event
 async def on_ready():
@@ -32,4 +56,12 @@ async def on_ready():
     await bot.load_extension("cogs.developer")
     await bot.tree.sync()
 
-bot.run(BOT_TOKEN)
+async def main():
+    async with bot:
+        await bot.db.open()
+        try:
+            await bot.start(BOT_TOKEN)
+        finally:
+            await shutdown()
+
+asyncio.run(main())
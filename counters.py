@@ -0,0 +1,59 @@
+import heapq
+
+class WarningCounters:
+    # Aktif uyarı sayıları bellekte tutulur: (sunucu, kullanıcı) -> ihlal türü -> {uyarı id: bitiş}
+    # Eskalasyon ve /user paneli tablo taraması yerine doğrudan bu sözlükten okur
+    def __init__(self):
+        self.ready = False
+        self._active = {}
+        self._expiry = []
+
+    def load(self, rows):
+        # rows: (id, user_id, guild_id, violation_type, expires_at)
+        self._active = {}
+        self._expiry = []
+        for warning_id, user_id, guild_id, violation_type, expires_at in rows:
+            self.add(guild_id, user_id, violation_type, warning_id, expires_at)
+        self.ready = True
+
+    def add(self, guild_id, user_id, violation_type, warning_id, expires_at):
+        types = self._active.setdefault((guild_id, user_id), {})
+        types.setdefault(violation_type, {})[warning_id] = expires_at
+        heapq.heappush(self._expiry, (expires_at, guild_id, user_id, violation_type, warning_id))
+
+    def remove(self, guild_id, user_id, violation_type, warning_id):
+        # Yığındaki kayıt yerinde kalır; süresi geldiğinde expire() tarafından yok sayılır
+        types = self._active.get((guild_id, user_id))
+        if not types or violation_type not in types:
+            return False
+        removed = types[violation_type].pop(warning_id, None) is not None
+        if not types[violation_type]:
+            del types[violation_type]
+        if not types:
+            del self._active[(guild_id, user_id)]
+        return removed
+
+    def expire(self, now):
+        expired = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            _, guild_id, user_id, violation_type, warning_id = heapq.heappop(self._expiry)
+            if self.remove(guild_id, user_id, violation_type, warning_id):
+                expired += 1
+        return expired
+
+    def count(self, guild_id, user_id, now, violation_type=None):
+        self.expire(now)
+        types = self._active.get((guild_id, user_id))
+        if not types:
+            return 0
+        if violation_type is not None:
+            return len(types.get(violation_type, ()))
+        return sum(len(warnings) for warnings in types.values())
+
+    def snapshot(self, now):
+        self.expire(now)
+        return {
+            (guild_id, user_id, violation_type): len(warnings)
+            for (guild_id, user_id), types in self._active.items()
+            for violation_type, warnings in types.items()
+        }
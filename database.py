@@ -1,44 +1,434 @@
+import asyncio
+from collections import namedtuple
+from contextlib import asynccontextmanager
 import aiosqlite
+import logging
+import time
+
+logger = logging.getLogger("HabsenBot")
+
+def epoch(moment=None):
+    # Zaman damgaları veritabanında UTC epoch saniyesi (INTEGER) olarak tutulur
+    if moment is None:
+        return int(time.time())
+    return int(moment.timestamp())
+
+WriteResult = namedtuple("WriteResult", ["lastrowid", "rowcount"])
+
+PRAGMAS = (
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA cache_size = -16000',
+    'PRAGMA mmap_size = 268435456',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA foreign_keys = ON',
+)
 
 class Database:
-    @staticmethod
-    async def init():
-        async with aiosqlite.connect("warnings.db") as db:
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS warnings (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    guild_id INTEGER,
-                    violation_type TEXT,
-                    reason TEXT,
-                    moderator_id INTEGER,
-                    timestamp TEXT,
-                    expires_at TEXT
-                )
-            ''')
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS jails (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    guild_id INTEGER,
-                    moderator_id INTEGER,
-                    start_time TEXT,
-                    end_time TEXT,
-                    original_roles TEXT
-                )
-            ''')
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS badges (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    guild_id INTEGER,
-                    badge_url TEXT,
-                    status TEXT,
-                    moderator_id INTEGER,
-                    submitted_at TEXT,
-                    reviewed_at TEXT,
-                    reason TEXT,
-                    message_id INTEGER
-                )
-            ''')
+    def __init__(self, path="warnings.db", readers=3, batch_size=64):
+        self.path = path
+        self.reader_count = readers
+        self.batch_size = batch_size
+        self._writer = None
+        self._writer_task = None
+        self._write_queue = asyncio.Queue()
+        self._readers = asyncio.Queue()
+        self._reader_connections = []
+        self._pending_writes = 0
+        self._holds = 0
+
+    async def connect(self):
+        # isolation_level=None: işlemler BEGIN/COMMIT ile açıkça yönetilir
+        connection = await aiosqlite.connect(self.path, isolation_level=None, cached_statements=256)
+        for pragma in PRAGMAS:
+            await connection.execute(pragma)
+        return connection
+
+    async def open(self):
+        if self._writer is not None:
+            return
+        self._writer = await self.connect()
+        await self._writer.execute('PRAGMA journal_mode = WAL')
+        await self.migrate(self._writer)
+        for _ in range(self.reader_count):
+            connection = await self.connect()
+            self._reader_connections.append(connection)
+            self._readers.put_nowait(connection)
+        self._writer_task = asyncio.create_task(self._write_loop())
+
+    async def close(self):
+        if self._writer is None:
+            return
+        self._write_queue.put_nowait(None)
+        await self._writer_task
+        self._writer_task = None
+        await self._writer.close()
+        self._writer = None
+        for connection in self._reader_connections:
+            await connection.close()
+        self._reader_connections.clear()
+        self._readers = asyncio.Queue()
+
+    @property
+    def idle(self):
+        # Bekleyen yazma yoksa, tüm okuyucular havuzdaysa ve kimse tutmuyorsa bağlantılar güvenle kapatılabilir
+        return (self._holds == 0 and self._pending_writes == 0
+                and self._readers.qsize() == len(self._reader_connections))
+
+    @asynccontextmanager
+    async def hold(self):
+        # Birden fazla işi aralıklarla çalıştıran çağıranlar dosyanın bu sırada kapatılmasını engeller
+        self._holds += 1
+        try:
+            yield self
+        finally:
+            self._holds -= 1
+
+    def _check_open(self):
+        # Kapatılmış bir veritabanına gönderilen iş hiçbir zaman tamamlanmaz; beklemek yerine hata verilir
+        if self._writer is None:
+            raise RuntimeError(f"Veritabanı kapalı: {self.path}")
+
+    async def for_guild(self, guild_id):
+        # Tek dosyalı kurulumda tüm sunucular aynı veritabanını paylaşır (bkz. storage.StorageRouter)
+        return self
+
+    async def shards(self):
+        yield self
+
+    async def migrate(self, db):
+        await db.execute('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY)')
+        cursor = await db.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version')
+        current = (await cursor.fetchone())[0]
+        for version, migration in MIGRATIONS:
+            if version <= current:
+                continue
+            await db.execute('BEGIN IMMEDIATE')
+            try:
+                await migration(db)
+                await db.execute('INSERT INTO schema_version (version) VALUES (?)', (version,))
+            except BaseException:
+                await db.rollback()
+                raise
             await db.commit()
+            logger.info(f"Veritabanı şeması {version}. sürüme güncellendi: {migration.__name__}")
+
+    async def _write_loop(self):
+        while True:
+            batch = [await self._write_queue.get()]
+            while len(batch) < self.batch_size and not self._write_queue.empty():
+                batch.append(self._write_queue.get_nowait())
+            closing = None in batch
+            batch = [item for item in batch if item is not None]
+            if batch:
+                await self._commit_batch(batch)
+            if closing:
+                return
+
+    async def _commit_batch(self, batch):
+        # Grup commit: aynı anda bekleyen yazmalar tek işlem ve tek fsync ile yazılır,
+        # her iş kendi SAVEPOINT'inde çalıştığı için bir hatalı iş diğerlerini geri almaz
+        db = self._writer
+        completed = []
+        try:
+            await db.execute('BEGIN IMMEDIATE')
+            for job, future in batch:
+                await db.execute('SAVEPOINT job')
+                try:
+                    result = await job(db)
+                except Exception as e:
+                    await db.execute('ROLLBACK TO job')
+                    await db.execute('RELEASE job')
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    await db.execute('RELEASE job')
+                    completed.append((future, result))
+            await db.execute('COMMIT')
+        except Exception as e:
+            logger.error(f"Veritabanı yazma grubu başarısız: {str(e)}")
+            if db.in_transaction:
+                await db.rollback()
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result in completed:
+            if not future.done():
+                future.set_result(result)
+
+    async def write(self, job):
+        self._check_open()
+        future = asyncio.get_running_loop().create_future()
+        self._write_queue.put_nowait((job, future))
+        self._pending_writes += 1
+        try:
+            return await future
+        finally:
+            self._pending_writes -= 1
+
+    @asynccontextmanager
+    async def reader(self):
+        self._check_open()
+        connection = await self._readers.get()
+        try:
+            yield connection
+        finally:
+            self._readers.put_nowait(connection)
+
+    async def fetchone(self, query, params=()):
+        async with self.reader() as db:
+            cursor = await db.execute(query, params)
+            return await cursor.fetchone()
+
+    async def fetchall(self, query, params=()):
+        async with self.reader() as db:
+            cursor = await db.execute(query, params)
+            return await cursor.fetchall()
+
+    async def execute(self, query, params=()):
+        async def job(db):
+            cursor = await db.execute(query, params)
+            return WriteResult(cursor.lastrowid, cursor.rowcount)
+        return await self.write(job)
+
+async def create_tables(db):
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS warnings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            guild_id INTEGER,
+            violation_type TEXT,
+            reason TEXT,
+            moderator_id INTEGER,
+            timestamp TEXT,
+            expires_at TEXT
+        )
+    ''')
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS jails (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            guild_id INTEGER,
+            moderator_id INTEGER,
+            start_time TEXT,
+            end_time TEXT,
+            original_roles TEXT
+        )
+    ''')
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS badges (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            guild_id INTEGER,
+            badge_url TEXT,
+            status TEXT,
+            moderator_id INTEGER,
+            submitted_at TEXT,
+            reviewed_at TEXT,
+            reason TEXT,
+            message_id INTEGER
+        )
+    ''')
+
+async def create_hot_path_indexes(db):
+    # Uyarı eskalasyonu ve /warnlist: eşitlik sütunları önce, aralık sütunu en sonda
+    await db.execute('''
+        CREATE INDEX IF NOT EXISTS idx_warnings_active_by_type
+        ON warnings (user_id, guild_id, violation_type, expires_at)
+    ''')
+    await db.execute('''
+        CREATE INDEX IF NOT EXISTS idx_warnings_active
+        ON warnings (user_id, guild_id, expires_at)
+    ''')
+    # check_jails ve /unjail, jail butonu
+    await db.execute('CREATE INDEX IF NOT EXISTS idx_jails_end_time ON jails (end_time)')
+    await db.execute('''
+        CREATE INDEX IF NOT EXISTS idx_jails_active
+        ON jails (user_id, guild_id, end_time)
+    ''')
+    # Saatlik rozet sınırı, Rozet Durum ve Rozet İptal
+    await db.execute('''
+        CREATE INDEX IF NOT EXISTS idx_badges_user_submitted
+        ON badges (user_id, guild_id, submitted_at)
+    ''')
+    # Ticket.on_ready: yalnızca beklemedeki talepleri içeren kısmi indeks
+    await db.execute('''
+        CREATE INDEX IF NOT EXISTS idx_badges_pending
+        ON badges (id) WHERE status = 'pending'
+    ''')
+    await db.execute('ANALYZE')
+
+async def convert_timestamps_to_epoch(db):
+    # TEXT sütun yakınlığı tamsayıları metne çevireceği için tablolar INTEGER sütunlarla yeniden oluşturulur
+    await db.execute('''
+        CREATE TABLE warnings_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            guild_id INTEGER,
+            violation_type TEXT,
+            reason TEXT,
+            moderator_id INTEGER,
+            timestamp INTEGER,
+            expires_at INTEGER
+        )
+    ''')
+    await db.execute('''
+        INSERT INTO warnings_new (id, user_id, guild_id, violation_type, reason, moderator_id, timestamp, expires_at)
+        SELECT id, user_id, guild_id, violation_type, reason, moderator_id,
+               CAST(strftime('%s', timestamp) AS INTEGER), CAST(strftime('%s', expires_at) AS INTEGER)
+        FROM warnings
+    ''')
+    await db.execute('''
+        CREATE TABLE jails_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            guild_id INTEGER,
+            moderator_id INTEGER,
+            start_time INTEGER,
+            end_time INTEGER,
+            original_roles TEXT
+        )
+    ''')
+    await db.execute('''
+        INSERT INTO jails_new (id, user_id, guild_id, moderator_id, start_time, end_time, original_roles)
+        SELECT id, user_id, guild_id, moderator_id,
+               CAST(strftime('%s', start_time) AS INTEGER), CAST(strftime('%s', end_time) AS INTEGER), original_roles
+        FROM jails
+    ''')
+    await db.execute('''
+        CREATE TABLE badges_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            guild_id INTEGER,
+            badge_url TEXT,
+            status TEXT,
+            moderator_id INTEGER,
+            submitted_at INTEGER,
+            reviewed_at INTEGER,
+            reason TEXT,
+            message_id INTEGER
+        )
+    ''')
+    await db.execute('''
+        INSERT INTO badges_new (id, user_id, guild_id, badge_url, status, moderator_id, submitted_at, reviewed_at, reason, message_id)
+        SELECT id, user_id, guild_id, badge_url, status, moderator_id,
+               CAST(strftime('%s', submitted_at) AS INTEGER), CAST(strftime('%s', reviewed_at) AS INTEGER), reason, message_id
+        FROM badges
+    ''')
+    for table in ("warnings", "jails", "badges"):
+        await db.execute(f'DROP TABLE {table}')
+        await db.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+    await create_hot_path_indexes(db)
+
+async def create_history_tables(db):
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS warnings_history (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            guild_id INTEGER,
+            violation_type TEXT,
+            reason TEXT,
+            moderator_id INTEGER,
+            timestamp INTEGER,
+            expires_at INTEGER,
+            archived_at INTEGER
+        )
+    ''')
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS jails_history (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            guild_id INTEGER,
+            moderator_id INTEGER,
+            start_time INTEGER,
+            end_time INTEGER,
+            original_roles TEXT,
+            archived_at INTEGER
+        )
+    ''')
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS badges_history (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            guild_id INTEGER,
+            badge_url TEXT,
+            status TEXT,
+            moderator_id INTEGER,
+            submitted_at INTEGER,
+            reviewed_at INTEGER,
+            reason TEXT,
+            message_id INTEGER,
+            archived_at INTEGER
+        )
+    ''')
+    # /warnlist geçmiş görünümü
+    await db.execute('''
+        CREATE INDEX IF NOT EXISTS idx_warnings_history_user
+        ON warnings_history (user_id, guild_id, timestamp)
+    ''')
+    # Arşivleme görevinin parça seçimleri
+    await db.execute('CREATE INDEX IF NOT EXISTS idx_warnings_expires_at ON warnings (expires_at)')
+    await db.execute('''
+        CREATE INDEX IF NOT EXISTS idx_badges_reviewed
+        ON badges (reviewed_at) WHERE status != 'pending'
+    ''')
+
+async def normalize_jail_roles(db):
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS jail_roles (
+            jail_id INTEGER NOT NULL REFERENCES jails (id) ON DELETE CASCADE,
+            role_id INTEGER NOT NULL,
+            PRIMARY KEY (jail_id, role_id)
+        ) WITHOUT ROWID
+    ''')
+    await db.execute('''
+        INSERT OR IGNORE INTO jail_roles (jail_id, role_id)
+        SELECT jails.id, roles.value FROM jails, json_each(jails.original_roles) AS roles
+        WHERE jails.original_roles IS NOT NULL AND json_valid(jails.original_roles)
+    ''')
+    await db.execute('ALTER TABLE jails DROP COLUMN original_roles')
+
+async def create_timers_table(db):
+    # TimerService kayıtları; (kind, key) başına tek bekleyen zamanlayıcı
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS timers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            guild_id INTEGER,
+            due INTEGER NOT NULL,
+            payload TEXT,
+            UNIQUE (kind, key)
+        )
+    ''')
+
+async def scope_timers_to_guild(db):
+    # Tek dosyalı kurulumda aynı kullanıcının farklı sunuculardaki zamanlayıcıları birbirinin yerini almasın
+    await db.execute('''
+        CREATE TABLE timers_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            guild_id INTEGER,
+            due INTEGER NOT NULL,
+            payload TEXT,
+            UNIQUE (kind, guild_id, key)
+        )
+    ''')
+    await db.execute('''
+        INSERT INTO timers_new (id, kind, key, guild_id, due, payload)
+        SELECT id, kind, key, guild_id, due, payload FROM timers
+    ''')
+    await db.execute('DROP TABLE timers')
+    await db.execute('ALTER TABLE timers_new RENAME TO timers')
+
+MIGRATIONS = [
+    (1, create_tables),
+    (2, create_hot_path_indexes),
+    (3, convert_timestamps_to_epoch),
+    (4, create_history_tables),
+    (5, normalize_jail_roles),
+    (6, create_timers_table),
+    (7, scope_timers_to_guild),
+]
@@ -5,6 +5,10 @@ import os
 import sys
 from datetime import datetime
 from zoneinfo import ZoneInfo
+from database import epoch
+from utils.helpers import (browser_pool, selenium_executor, username_cache, profile_fetch_stats,
+                           profile_breaker, profile_rate_limit, error_reporter)
+from publisher import log_publisher, dm_dispatcher
 
 class Developer(commands.Cog):
     def __init__(self, bot):
@@ -39,9 +43,80 @@ class Developer(commands.Cog):
         embed.set_footer(text="Habsen Topluluğu")
         await interaction.followup.send(embed=embed, ephemeral=True)
 
-        # Botu yeniden başlat
+        # Botu yeniden başlat; kuyruktaki loglar ve DM'ler kapanıştan önce gönderilir
+        await self.bot.shutdown()
         python = sys.executable
         os.execl(python, python, *sys.argv)
 
+    @app_commands.command(name="sayackontrol", description="Uyarı sayaç önbelleğini veritabanıyla karşılaştırır (yalnızca geliştirici)")
+    @app_commands.describe(onar="Fark bulunursa önbelleği veritabanından yeniden yükle")
+    async def check_counters(self, interaction: discord.Interaction, onar: bool = False):
+        if not await self.check_developer(interaction):
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        moderation = self.bot.get_cog("Moderation")
+        mismatches = await moderation.warning_repo.check_counters(epoch(), repair=onar)
+        if mismatches:
+            lines = [f"`{guild_id}` <@{user_id}> {violation_type}: önbellek {cached}, veritabanı {actual}"
+                     for (guild_id, user_id, violation_type), cached, actual in mismatches[:20]]
+            embed = discord.Embed(
+                title="Sayaç Tutarsızlığı",
+                description="\n".join(lines) + ("\n\nÖnbellek yeniden yüklendi." if onar else ""),
+                color=0xff0000,
+                timestamp=datetime.now(ZoneInfo("UTC"))
+            )
+            embed.add_field(name="Farklı Anahtar", value=str(len(mismatches)))
+        else:
+            embed = discord.Embed(
+                title="Sayaçlar Tutarlı",
+                description="Uyarı sayaç önbelleği veritabanıyla eşleşiyor.",
+                color=0x00ff00,
+                timestamp=datetime.now(ZoneInfo("UTC"))
+            )
+        embed.set_footer(text="Habsen Topluluğu")
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="metrikler", description="Profil denetimi altyapısının durumunu gösterir (yalnızca geliştirici)")
+    async def metrics(self, interaction: discord.Interaction):
+        if not await self.check_developer(interaction):
+            return
+
+        embed = discord.Embed(
+            title="Profil Denetimi Metrikleri",
+            color=0x800080,
+            timestamp=datetime.now(ZoneInfo("UTC"))
+        )
+        embed.add_field(name="Profil İstekleri",
+                        value="\n".join(f"{name}: {value}" for name, value in profile_fetch_stats.items()),
+                        inline=False)
+        embed.add_field(name="Devre Kesici",
+                        value="\n".join(f"{name}: {value}" for name, value in profile_breaker.stats().items())
+                              + f"\nhız sınırına takılan: {profile_rate_limit.throttled}",
+                        inline=False)
+        embed.add_field(name="Kullanıcı Adı Önbelleği",
+                        value="\n".join(f"{name}: {value}" for name, value in username_cache.stats().items()),
+                        inline=False)
+        embed.add_field(name="Tarayıcı Havuzu",
+                        value="\n".join(f"{name}: {value}" for name, value in browser_pool.stats().items()),
+                        inline=False)
+        embed.add_field(name="Selenium İş Kuyruğu",
+                        value="\n".join(f"{name}: {value}" for name, value in selenium_executor.stats().items()),
+                        inline=False)
+        embed.add_field(name="Log Kuyruğu",
+                        value="\n".join(f"{name}: {value}" for name, value in log_publisher.stats().items()),
+                        inline=False)
+        embed.add_field(name="DM Kuyruğu",
+                        value="\n".join(f"{name}: {value}" for name, value in dm_dispatcher.stats().items()),
+                        inline=False)
+        embed.add_field(name="Zamanlayıcılar",
+                        value="\n".join(f"{name}: {value}" for name, value in self.bot.timers.stats().items()),
+                        inline=False)
+        embed.add_field(name="Hata Bildirimleri",
+                        value="\n".join(f"{name}: {value}" for name, value in error_reporter.stats().items()),
+                        inline=False)
+        embed.set_footer(text="Habsen Topluluğu")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
 async def setup(bot):
     await bot.add_cog(Developer(bot))
@@ -1,80 +1,684 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException, WebDriverException
+import asyncio
 import discord
 import aiohttp
+import aiosqlite
 import logging
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack, asynccontextmanager
 from datetime import datetime
+from html.parser import HTMLParser
+from urllib.parse import quote
 from zoneinfo import ZoneInfo
 import os
+import time
 
 logger = logging.getLogger("HabsenBot")
 
+# Çevrimdışı denemelerde profile_stub.py sunucusuna yönlendirilebilir
+PROFILE_URL = os.getenv("HABSEN_PROFILE_URL", "https://habsen.com.tr/profile/{username}")
+NOT_FOUND_TEXT = "hiç kullanıcı bulunamadı"
+MOTTO_MARKER = "KOD-"
+PROFILE_TIMEOUT = float(os.getenv("PROFILE_TIMEOUT", "5"))
+# Selenium yalnızca açıkça istenirse, HTTP denetimi sonuç veremediğinde kullanılır
+SELENIUM_FALLBACK = os.getenv("PROFILE_SELENIUM_FALLBACK", "0") == "1"
+
+_http_session = None
+
+async def get_http_session():
+    # Tüm profil istekleri tek oturumu ve keep-alive bağlantılarını paylaşır
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=PROFILE_TIMEOUT),
+            connector=aiohttp.TCPConnector(limit=20, keepalive_timeout=60),
+            headers={"User-Agent": "HabsenBot/1.0"}
+        )
+    return _http_session
+
+async def close_http_session():
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
+
+class ErrorReporter:
+    # Hata bildirimleri kuyruğa alınır ve flush_interval saniyede bir gönderilir. Aynı mesaj window saniye içinde
+    # yalnızca bir kez gönderilir, aradaki tekrarlar sayılıp sonraki gönderimde belirtilir; bir webhook çağrısı
+    # en fazla 10 embed ve 6000 karakter taşır
+    def __init__(self, window=300, flush_interval=5):
+        self.window = window
+        self.flush_interval = flush_interval
+        self._queue = asyncio.Queue()
+        self._counts = OrderedDict()
+        self._last_sent = {}
+        self._task = None
+        self.reported = 0
+        self.sent = 0
+        self.webhook_calls = 0
+
+    def report(self, message):
+        self.reported += 1
+        self._queue.put_nowait(message[:2000])
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            # Pencere nedeniyle bekletilen tekrarlar varsa yeni hata gelmese de düzenli olarak yeniden denenir
+            if not self._counts:
+                self._collect(await self._queue.get())
+            await asyncio.sleep(self.flush_interval)
+            while not self._queue.empty():
+                self._collect(self._queue.get_nowait())
+            await self.flush()
+
+    def _collect(self, message):
+        self._counts[message] = self._counts.get(message, 0) + 1
+
+    async def flush(self, force=False):
+        now = time.monotonic()
+        for message, sent_at in list(self._last_sent.items()):
+            if now - sent_at >= self.window:
+                del self._last_sent[message]
+        ready = [(message, count) for message, count in self._counts.items()
+                 if force or message not in self._last_sent]
+        for message, _ in ready:
+            del self._counts[message]
+            self._last_sent[message] = now
+        # Discord bir mesajda en fazla 10 embed ve toplam 6000 karakter kabul eder
+        batch, size = [], 0
+        for message, count in ready:
+            embed = self._embed(message, count)
+            if batch and (len(batch) == 10 or size + len(embed) > 6000):
+                await self._send(batch)
+                batch, size = [], 0
+            batch.append(embed)
+            size += len(embed)
+        if batch:
+            await self._send(batch)
+
+    def _embed(self, message, count):
+        embed = discord.Embed(
+            title="Kritik Hata",
+            description=message,
+            color=0xFF0000,
+            timestamp=datetime.now(ZoneInfo("UTC"))
+        )
+        if count > 1:
+            embed.add_field(name="Tekrar", value=f"{count} kez")
+        embed.set_footer(text="Habsen Bot")
+        return embed
+
+    async def _send(self, embeds):
+        LOG_WEBHOOK_URL = os.getenv("LOG_WEBHOOK_URL")
+        if not LOG_WEBHOOK_URL:
+            return
+        try:
+            webhook = discord.Webhook.from_url(LOG_WEBHOOK_URL, session=await get_http_session())
+            await webhook.send(embeds=embeds)
+            self.webhook_calls += 1
+            self.sent += len(embeds)
+        except Exception as e:
+            logger.error(f"Webhook gönderimi başarısız: {str(e)}")
+
+    async def close(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        while not self._queue.empty():
+            self._collect(self._queue.get_nowait())
+        await self.flush(force=True)
+
+    def stats(self):
+        return {
+            "bildirilen": self.reported,
+            "gönderilen embed": self.sent,
+            "webhook çağrısı": self.webhook_calls,
+            "bekleyen": len(self._counts) + self._queue.qsize(),
+        }
+
+error_reporter = ErrorReporter(window=int(os.getenv("ERROR_DEDUPE_WINDOW", "300")),
+                               flush_interval=float(os.getenv("ERROR_FLUSH_INTERVAL", "5")))
+
 async def log_error_to_discord(error_message):
-    LOG_WEBHOOK_URL = os.getenv("LOG_WEBHOOK_URL")
-    if not LOG_WEBHOOK_URL:
-        return
-    try:
-        async with aiohttp.ClientSession() as session:
-            webhook = discord.Webhook.from_url(LOG_WEBHOOK_URL, session=session)
-            embed = discord.Embed(
-                title="Kritik Hata",
-                description=error_message[:2000],
-                color=0xFF0000,
-                timestamp=datetime.now(ZoneInfo("UTC"))
+    error_reporter.report(error_message)
+
+class ProfilePageParser(HTMLParser):
+    # Sayfadan yalnızca "kullanıcı bulunamadı" metni ve KOD- içeren span metni çıkarılır
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.not_found = False
+        self.motto = None
+        self._spans = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style"):
+            self._skip += 1
+        elif tag == "span":
+            self._spans.append([])
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style"):
+            self._skip = max(0, self._skip - 1)
+        elif tag == "span" and self._spans:
+            text = "".join(self._spans.pop())
+            if self.motto is None and MOTTO_MARKER in text:
+                self.motto = text.strip().replace('\u00A0', '')
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        if NOT_FOUND_TEXT in data.lower():
+            self.not_found = True
+        if self._spans:
+            self._spans[-1].append(data)
+
+def parse_profile(html):
+    parser = ProfilePageParser()
+    parser.feed(html)
+    parser.close()
+    return not parser.not_found, parser.motto
+
+async def fetch_profile(username):
+    # (kullanıcı var mı, motto) döner; bağlantı hataları çağırana iletilir. Yalnızca 200 bir profil
+    # sayfasıdır, 404 kullanıcının olmadığını gösterir; 403/429 ve diğer durumlar hata sayılır
+    session = await get_http_session()
+    async with session.get(PROFILE_URL.format(username=quote(username, safe=""))) as response:
+        if response.status == 404:
+            return False, None
+        if response.status != 200:
+            raise aiohttp.ClientResponseError(response.request_info, response.history,
+                                              status=response.status, message=response.reason)
+        html = await response.text()
+    return parse_profile(html)
+
+MISSING = object()
+
+class TTLCache:
+    # Boyutu sınırlı, en eski kullanılanı atan ve her kaydın kendi bitiş zamanı olan önbellek
+    def __init__(self, maxsize=2048):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, now=None):
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= (now or time.time()):
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return MISSING
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key, value, expires_at):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+class UsernameCache(TTLCache):
+    # Var olan kullanıcı adları uzun, bulunamayanlar kısa süre saklanır; istek hataları hiç saklanmaz.
+    # path verilirse kayıtlar küçük bir SQLite dosyasına da yazılır ve yeniden başlatmada geri yüklenir
+    def __init__(self, maxsize=2048, positive_ttl=3600, negative_ttl=300, path=None):
+        super().__init__(maxsize)
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.path = path
+        self._db = None
+
+    async def open(self):
+        if not self.path or self._db is not None:
+            return
+        self._db = await aiosqlite.connect(self.path)
+        await self._db.execute('''
+            CREATE TABLE IF NOT EXISTS username_cache (
+                username TEXT PRIMARY KEY,
+                exists_on_site INTEGER NOT NULL,
+                expires_at INTEGER NOT NULL
             )
-            embed.set_footer(text="Habsen Bot")
-            await webhook.send(embed=embed)
-    except Exception as e:
-        logger.error(f"Webhook gönderimi başarısız: {str(e)}")
+        ''')
+        now = int(time.time())
+        await self._db.execute('DELETE FROM username_cache WHERE expires_at <= ?', (now,))
+        await self._db.commit()
+        cursor = await self._db.execute('''
+            SELECT username, exists_on_site, expires_at FROM username_cache
+            ORDER BY expires_at DESC LIMIT ?
+        ''', (self.maxsize,))
+        for username, exists, expires_at in reversed(await cursor.fetchall()):
+            self.set(username, bool(exists), expires_at)
 
-async def check_username_validity(username):
-    driver = None
+    async def close(self):
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+    async def remember(self, username, exists):
+        expires_at = int(time.time()) + (self.positive_ttl if exists else self.negative_ttl)
+        self.set(username, exists, expires_at)
+        if self._db is not None:
+            try:
+                await self._db.execute(
+                    'INSERT OR REPLACE INTO username_cache (username, exists_on_site, expires_at) VALUES (?, ?, ?)',
+                    (username, int(exists), expires_at)
+                )
+                await self._db.commit()
+            except aiosqlite.Error as e:
+                logger.error(f"Kullanıcı adı önbelleği yazılamadı: {str(e)}")
+
+    def stats(self):
+        return {
+            "kayıt": len(self),
+            "isabet": self.hits,
+            "ıskalama": self.misses,
+        }
+
+username_cache = UsernameCache(maxsize=int(os.getenv("USERNAME_CACHE_SIZE", "2048")),
+                               positive_ttl=int(os.getenv("USERNAME_CACHE_TTL", "3600")),
+                               negative_ttl=int(os.getenv("USERNAME_CACHE_NEGATIVE_TTL", "300")),
+                               path=os.getenv("USERNAME_CACHE_DB"))
+
+def chrome_options():
+    from selenium.webdriver.chrome.options import Options
+    options = Options()
+    options.add_argument('--headless')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--window-size=1920,1080')
+    return options
+
+class ExecutorBusy(Exception):
+    pass
+
+class BlockingExecutor:
+    # Selenium gibi engelleyen çağrılar olay döngüsünü dondurmasın diye sınırlı bir iş parçacığı havuzunda çalışır.
+    # Zaman aşımına uğrayan çağrının iş parçacığı bitene kadar yeri boşalmaz; kuyruk max_queue ile sınırlıdır.
+    # Çağrı bir kaynak kiralıyorsa (tarayıcı sürücüsü) kaynağı beklemek de kuyruğa ve wait_timeout'a dahildir
+    def __init__(self, workers=2, max_queue=20, timeout=15, wait_timeout=30):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.wait_timeout = wait_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="selenium")
+        self._slots = asyncio.Semaphore(workers)
+        self.waiting = 0
+        self.running = 0
+        self.max_waiting = 0
+        self.completed = 0
+        self.timed_out = 0
+        self.rejected = 0
+        self.wait_expired = 0
+
+    async def run(self, func, *args, lease=None):
+        # lease(timeout) kiralanan kaynağı veren bir bağlam yöneticisidir; kaynak func'a ilk argüman olarak geçer
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise ExecutorBusy("Selenium kuyruğu dolu")
+        async with AsyncExitStack() as stack:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.wait_timeout
+            try:
+                if lease is not None:
+                    args = (await stack.enter_async_context(lease(self.wait_timeout)), *args)
+                await asyncio.wait_for(self._slots.acquire(), max(0, deadline - loop.time()))
+            except TimeoutError:
+                self.wait_expired += 1
+                raise ExecutorBusy("Selenium kuyruğunda bekleme süresi doldu")
+            finally:
+                self.waiting -= 1
+            self.running += 1
+            future = loop.run_in_executor(self._executor, func, *args)
+            future.add_done_callback(self._finished)
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+            except TimeoutError:
+                self.timed_out += 1
+                raise
+
+    def _finished(self, future):
+        self.running -= 1
+        self.completed += 1
+        self._slots.release()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {
+            "işçi": self.workers,
+            "çalışan": self.running,
+            "kuyrukta": self.waiting,
+            "en yüksek kuyruk": self.max_waiting,
+            "tamamlanan": self.completed,
+            "zaman aşımı": self.timed_out,
+            "reddedilen": self.rejected,
+            "bekleme süresi dolan": self.wait_expired,
+        }
+
+selenium_executor = BlockingExecutor(workers=int(os.getenv("SELENIUM_WORKERS", "2")),
+                                     max_queue=int(os.getenv("SELENIUM_MAX_QUEUE", "20")),
+                                     timeout=float(os.getenv("SELENIUM_TIMEOUT", "15")),
+                                     wait_timeout=float(os.getenv("SELENIUM_WAIT_TIMEOUT", "30")))
+
+class BrowserPool:
+    # Selenium yedeği için sıcak tutulan Chrome sürücüleri; her denetim bir sürücüyü kiralar.
+    # Sürücü max_uses kullanımdan sonra ya da çöktüğünde kapatılıp yerine yenisi açılır
+    def __init__(self, size=2, max_uses=50):
+        self.size = size
+        self.max_uses = max_uses
+        self._slots = asyncio.Semaphore(size)
+        self._idle = []
+        self._uses = {}
+        self.in_use = 0
+        self.leases = 0
+        self.waits = 0
+        self.created = 0
+        self.recycled = 0
+        self.crashed = 0
+
+    def _new_driver(self):
+        from selenium import webdriver
+        driver = webdriver.Chrome(options=chrome_options())
+        self._uses[driver] = 0
+        self.created += 1
+        return driver
+
+    async def _discard(self, driver):
+        # quit(), zaman aşımına uğramış bir çağrının takıldığı iş parçacığını da serbest bırakır
+        self._uses.pop(driver, None)
+        try:
+            await asyncio.to_thread(driver.quit)
+        except Exception as e:
+            logger.error(f"Chrome sürücüsü kapatılamadı: {str(e)}")
+
+    async def warm(self):
+        while len(self._idle) + self.in_use < self.size:
+            self._idle.append(await asyncio.to_thread(self._new_driver))
+
+    @asynccontextmanager
+    async def lease(self, timeout=None):
+        from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
+        if self._slots.locked():
+            self.waits += 1
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        else:
+            await self._slots.acquire()
+        try:
+            driver = self._idle.pop() if self._idle else await asyncio.to_thread(self._new_driver)
+            self.in_use += 1
+            self.leases += 1
+            broken = False
+            try:
+                yield driver
+            except (NoSuchElementException, TimeoutException):
+                raise
+            except (WebDriverException, TimeoutError):
+                broken = True
+                raise
+            finally:
+                self.in_use -= 1
+                self._uses[driver] = self._uses.get(driver, 0) + 1
+                if broken:
+                    self.crashed += 1
+                    await self._discard(driver)
+                elif self._uses[driver] >= self.max_uses:
+                    self.recycled += 1
+                    await self._discard(driver)
+                else:
+                    self._idle.append(driver)
+        finally:
+            self._slots.release()
+
+    async def close(self):
+        while self._idle:
+            await self._discard(self._idle.pop())
+
+    def stats(self):
+        return {
+            "boyut": self.size,
+            "kullanımda": self.in_use,
+            "boşta": len(self._idle),
+            "kiralama": self.leases,
+            "bekleme": self.waits,
+            "açılan": self.created,
+            "yenilenen": self.recycled,
+            "çöken": self.crashed,
+        }
+
+browser_pool = BrowserPool(size=int(os.getenv("BROWSER_POOL_SIZE", "2")),
+                           max_uses=int(os.getenv("BROWSER_MAX_USES", "50")))
+
+def selenium_profile(driver, url):
+    # Tek sayfa yüklemesinde hem kullanıcının varlığı hem motto okunur
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import NoSuchElementException, TimeoutException
+    driver.get(url)
+    WebDriverWait(driver, 3).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
     try:
-        chrome_options = Options()
-        chrome_options.add_argument('--headless')
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--window-size=1920,1080')
-        driver = webdriver.Chrome(options=chrome_options)
-        driver.get(f"https://habsen.com.tr/profile/{username}")
-        WebDriverWait(driver, 3).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
         driver.find_element(By.XPATH, "//*[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'hiç kullanıcı bulunamadı')]")
-        return False
+        return False, None
     except NoSuchElementException:
-        return True
-    except WebDriverException as e:
-        logger.error(f"Selenium hatası (check_username_validity): {str(e)}")
-        await log_error_to_discord(f"Selenium hatası (check_username_validity): {str(e)}")
-        return False
-    finally:
-        if driver:
-            driver.quit()
-
-async def check_motto(username, code):
-    driver = None
+        pass
     try:
-        chrome_options = Options()
-        chrome_options.add_argument('--headless')
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--window-size=1920,1080')
-        driver = webdriver.Chrome(options=chrome_options)
-        driver.get(f"https://habsen.com.tr/profile/{username}")
         motto_element = WebDriverWait(driver, 3).until(
             EC.presence_of_element_located((By.XPATH, '//span[contains(text(), "KOD-")]'))
         )
-        motto_text = motto_element.text.strip().replace('\u00A0', '').lower()
-        return code.lower() in motto_text
-    except WebDriverException as e:
-        logger.error(f"Selenium hatası (check_motto): {str(e)}")
-        await log_error_to_discord(f"Selenium hatası (check_motto): {str(e)}")
+    except TimeoutException:
+        return True, None
+    return True, motto_element.text.strip().replace('\u00A0', '')
+
+async def selenium_fetch_profile(username):
+    return await selenium_executor.run(selenium_profile, PROFILE_URL.format(username=quote(username, safe="")),
+                                       lease=browser_pool.lease)
+
+PROFILE_FRESHNESS = float(os.getenv("PROFILE_FRESHNESS", "60"))
+MOTTO_FRESHNESS = float(os.getenv("MOTTO_FRESHNESS", "5"))
+
+class ProfileSnapshot:
+    # Profil sayfasının tek bir okuması; kullanıcı adı doğrulaması ve motto denetimi aynı görüntüyü kullanır
+    __slots__ = ("username", "exists", "motto", "fetched_at")
+
+    def __init__(self, username, exists, motto, fetched_at=None):
+        self.username = username
+        self.exists = exists
+        self.motto = motto
+        self.fetched_at = fetched_at or time.time()
+
+    def is_fresh(self, max_age):
+        return time.time() - self.fetched_at <= max_age
+
+    def motto_contains(self, code):
+        return self.motto is not None and code.lower() in self.motto.lower()
+
+profile_snapshots = TTLCache(maxsize=int(os.getenv("PROFILE_SNAPSHOT_CACHE_SIZE", "512")))
+
+class UpstreamUnavailable(Exception):
+    pass
+
+class TokenBucket:
+    # Saniyede rate istek, en fazla capacity kadar ani yük; max_wait'ten uzun bekleme gerekirse istek reddedilir
+    def __init__(self, rate=5, capacity=10, max_wait=10):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_wait = max_wait
+        self.tokens = capacity
+        self._updated = time.monotonic()
+        self.throttled = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        self._refill()
+        # Jeton hemen ayrılır; borç varsa çağıran payına düşen süre kadar bekler
+        wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0
+        if wait > self.max_wait:
+            self.throttled += 1
+            raise UpstreamUnavailable("İstek sınırı aşıldı")
+        self.tokens -= 1
+        if wait:
+            await asyncio.sleep(wait)
+
+class CircuitBreaker:
+    # Son window denemenin hata oranı threshold'u aşınca devre cooldown saniye açılır ve istekler hemen reddedilir;
+    # ardından tek bir deneme isteği (yarı açık) geçer, başarılıysa devre kapanır
+    def __init__(self, window=20, min_calls=5, threshold=0.5, cooldown=30):
+        self.window = window
+        self.min_calls = min_calls
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "kapalı"
+        self.opened_at = 0
+        self.rejected = 0
+        self._results = deque(maxlen=window)
+        self._probing = False
+
+    def before(self):
+        if self.state == "açık":
+            if time.monotonic() - self.opened_at < self.cooldown:
+                self.rejected += 1
+                raise UpstreamUnavailable("Habsen şu anda yanıt vermiyor")
+            self.state = "yarı açık"
+        if self.state == "yarı açık":
+            if self._probing:
+                self.rejected += 1
+                raise UpstreamUnavailable("Habsen şu anda yanıt vermiyor")
+            self._probing = True
+
+    def release(self):
+        self._probing = False
+
+    def record(self, success):
+        if self.state == "yarı açık":
+            self._probing = False
+            if success:
+                self.state = "kapalı"
+                self._results.clear()
+            else:
+                self._open()
+            return False
+        self._results.append(success)
+        failures = self._results.count(False)
+        if self.state == "kapalı" and len(self._results) >= self.min_calls and failures / len(self._results) >= self.threshold:
+            self._open()
+            return True
         return False
-    finally:
-        if driver:
-            driver.quit()
+
+    def _open(self):
+        self.state = "açık"
+        self.opened_at = time.monotonic()
+
+    def stats(self):
+        return {
+            "durum": self.state,
+            "son denemelerde hata": f"{self._results.count(False)}/{len(self._results)}",
+            "reddedilen": self.rejected,
+        }
+
+profile_rate_limit = TokenBucket(rate=float(os.getenv("PROFILE_RATE", "5")),
+                                 capacity=int(os.getenv("PROFILE_BURST", "10")),
+                                 max_wait=float(os.getenv("PROFILE_RATE_MAX_WAIT", "10")))
+profile_breaker = CircuitBreaker(window=int(os.getenv("BREAKER_WINDOW", "20")),
+                                 min_calls=int(os.getenv("BREAKER_MIN_CALLS", "5")),
+                                 threshold=float(os.getenv("BREAKER_ERROR_RATE", "0.5")),
+                                 cooldown=float(os.getenv("BREAKER_COOLDOWN", "30")))
+
+async def read_profile(username, need_motto=False):
+    # None: profile ne HTTP ne de (açıksa) Selenium ile ulaşılabildi
+    try:
+        exists, motto = await fetch_profile(username)
+        # Motto sayfaya istemci tarafında yazılıyorsa HTML'de bulunmaz; yalnızca o durumda tarayıcıya düşülür
+        if not (need_motto and exists and motto is None and SELENIUM_FALLBACK):
+            return ProfileSnapshot(username, exists, motto)
+    except (aiohttp.ClientError, TimeoutError) as e:
+        logger.error(f"Profil isteği hatası ({username}): {str(e) or type(e).__name__}")
+        if not SELENIUM_FALLBACK:
+            return None
+
+    from selenium.common.exceptions import WebDriverException
+    try:
+        exists, motto = await selenium_fetch_profile(username)
+    except (WebDriverException, TimeoutError, ExecutorBusy) as e:
+        logger.error(f"Selenium hatası ({username}): {str(e) or type(e).__name__}")
+        return None
+    return ProfileSnapshot(username, exists, motto)
+
+async def fetch_snapshot(username, need_motto=False):
+    # Tüm habsen.com.tr istekleri hız sınırından ve devre kesiciden geçer; ulaşılamazsa UpstreamUnavailable
+    profile_breaker.before()
+    try:
+        await profile_rate_limit.acquire()
+        snapshot = await read_profile(username, need_motto)
+    except BaseException:
+        # Hız sınırı reddi ya da iptal sitenin hatası sayılmaz
+        profile_breaker.release()
+        raise
+    if profile_breaker.record(snapshot is not None):
+        # Hata fırtınası yerine devre açıldığında tek bir bildirim
+        logger.error("Habsen profil istekleri için devre kesici açıldı")
+        await log_error_to_discord(f"Habsen profil istekleri art arda başarısız oldu; devre kesici "
+                                   f"{int(profile_breaker.cooldown)} saniyeliğine açıldı.")
+    if snapshot is None:
+        raise UpstreamUnavailable("Habsen profiline ulaşılamadı")
+    return snapshot
+
+# Aynı kullanıcı adı için süren istek; eşzamanlı denetimler yeni istek açmak yerine onun sonucunu bekler
+_inflight_profiles = {}
+profile_fetch_stats = {"istek": 0, "birleştirilen": 0}
+
+async def load_snapshot(username, need_motto):
+    profile_fetch_stats["istek"] += 1
+    snapshot = await fetch_snapshot(username, need_motto)
+    profile_snapshots.set(username, snapshot, snapshot.fetched_at + max(PROFILE_FRESHNESS, MOTTO_FRESHNESS))
+    await username_cache.remember(username, snapshot.exists)
+    return snapshot
+
+async def get_profile(username, max_age=PROFILE_FRESHNESS, need_motto=False):
+    snapshot = profile_snapshots.get(username)
+    if snapshot is not MISSING and snapshot.is_fresh(max_age):
+        return snapshot
+    task = _inflight_profiles.get(username)
+    if task is None:
+        task = asyncio.ensure_future(load_snapshot(username, need_motto))
+        _inflight_profiles[username] = task
+        task.add_done_callback(lambda _: _inflight_profiles.pop(username, None))
+    else:
+        profile_fetch_stats["birleştirilen"] += 1
+    # Bekleyenlerden birinin iptali ortak isteği iptal etmez
+    return await asyncio.shield(task)
+
+async def check_username_validity(username):
+    exists = username_cache.get(username)
+    if exists is not MISSING:
+        return exists
+    snapshot = await get_profile(username)
+    return snapshot.exists
+
+async def check_motto(username, code):
+    # Kullanıcı mottoyu yeni değiştirmiş olabilir; yalnızca birkaç saniyelik görüntü yeniden kullanılır
+    snapshot = await get_profile(username, max_age=MOTTO_FRESHNESS, need_motto=True)
+    return snapshot.motto_contains(code)
+
+async def close_helpers():
+    await error_reporter.close()
+    await close_http_session()
+    await browser_pool.close()
+    selenium_executor.shutdown()
+    await username_cache.close()
@@ -1,18 +1,39 @@
+import asyncio
 import discord
 from discord import app_commands
 from discord.ext import commands, tasks
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
-import aiosqlite
-import json
+from database import epoch
+from repositories import WarningRepo, JailRepo
+from counters import WarningCounters
+from scheduler import DeadlineScheduler
+from publisher import log_publisher
+import logging
 import os
 
+logger = logging.getLogger("HabsenBot")
+
+# Rolleri geri verilemeyen jail'ler bu aralıkla başlayıp ikiye katlanarak yeniden denenir
+JAIL_RETRY_DELAY = int(os.getenv("JAIL_RETRY_DELAY", "60"))
+JAIL_MAX_RETRY_DELAY = int(os.getenv("JAIL_MAX_RETRY_DELAY", "3600"))
+
+def released_roles(member, role_ids, guild_roles, jail_role):
+    # Jail rolü çıkarılır, kayıtlı roller sunucunun rol kümesine göre doğrulanıp tek düzenlemede geri verilir
+    roles = {role.id: role for role in member.roles if role != jail_role and not role.is_default()}
+    for role_id in role_ids:
+        role = guild_roles.get(role_id)
+        if role and role.is_assignable():
+            roles[role.id] = role
+    return list(roles.values())
+
 class WarningListView(discord.ui.View):
-    def __init__(self, warnings, user, moderator, page=0):
+    def __init__(self, warnings, user, moderator, page=0, title="Uyarı Listesi"):
         super().__init__(timeout=120)
         self.warnings = warnings
         self.user = user
         self.moderator = moderator
+        self.title = title
         self.page = page
         self.per_page = 5
         self.update_buttons()
@@ -27,11 +48,9 @@ class WarningListView(discord.ui.View):
         page_warnings = self.warnings[start:end]
         content = ""
         for warning in page_warnings:
-            warning_id = warning[0]
-            violation_type = warning[3].replace("_", " ").title()
-            reason = warning[4]
-            timestamp = datetime.fromisoformat(warning[6])
-            content += f"**ID:** {warning_id} | **İhlal:** {violation_type}\n**Sebep:** {reason}\n**Tarih:** {timestamp.strftime('%Y-%m-%d %H:%M')}\n\n"
+            violation_type = warning.violation_type.replace("_", " ").title()
+            timestamp = datetime.fromtimestamp(warning.timestamp, ZoneInfo("UTC"))
+            content += f"**ID:** {warning.id} | **İhlal:** {violation_type}\n**Sebep:** {warning.reason}\n**Tarih:** {timestamp.strftime('%Y-%m-%d %H:%M')}\n\n"
         return content if content else "Bu sayfada uyarı yok."
 
     @discord.ui.button(label="⬅️", style=discord.ButtonStyle.primary)
@@ -42,7 +61,7 @@ class WarningListView(discord.ui.View):
         self.page -= 1
         self.update_buttons()
         embed = discord.Embed(
-            title=f"{self.user.display_name} - Uyarı Listesi",
+            title=f"{self.user.display_name} - {self.title}",
             description=self.get_page_content(),
             color=0x800080,
             timestamp=datetime.now(ZoneInfo("UTC"))
@@ -59,7 +78,7 @@ class WarningListView(discord.ui.View):
         self.page += 1
         self.update_buttons()
         embed = discord.Embed(
-            title=f"{self.user.display_name} - Uyarı Listesi",
+            title=f"{self.user.display_name} - {self.title}",
             description=self.get_page_content(),
             color=0x800080,
             timestamp=datetime.now(ZoneInfo("UTC"))
@@ -69,10 +88,12 @@ class WarningListView(discord.ui.View):
         await interaction.response.edit_message(embed=embed, view=self)
 
 class UserInfoView(discord.ui.View):
-    def __init__(self, user, moderator):
+    def __init__(self, user, moderator, warning_repo, jail_repo):
         super().__init__(timeout=120)
         self.user = user
         self.moderator = moderator
+        self.warning_repo = warning_repo
+        self.jail_repo = jail_repo
         self.VIOLATION_RULES = {
             "ailevi_kufur": [
                 {"count": 1, "action": "warn", "description": "Uyarı"},
@@ -143,11 +164,10 @@ class UserInfoView(discord.ui.View):
         await interaction.response.defer(ephemeral=True)
 
         class WarnSelect(discord.ui.View):
-            def __init__(self, user, apply_punishment, log_warning):
+            def __init__(self, user, issue_warning):
                 super().__init__(timeout=60)
                 self.user = user
-                self.apply_punishment = apply_punishment
-                self.log_warning = log_warning
+                self.issue_warning = issue_warning
 
             @discord.ui.select(
                 placeholder="Ceza Türü Seçin",
@@ -166,25 +186,7 @@ class UserInfoView(discord.ui.View):
             async def select_callback(self, interaction: discord.Interaction, select: discord.ui.Select):
                 await interaction.response.defer(ephemeral=True)
                 violation_type = select.values[0]
-                async with aiosqlite.connect("warnings.db") as db:
-                    expires_at = (datetime.now(ZoneInfo("UTC")) + timedelta(days=1)).isoformat()
-                    await db.execute('''
-                        INSERT INTO warnings (user_id, guild_id, violation_type, reason, moderator_id, timestamp, expires_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', (self.user.id, interaction.guild_id, violation_type, 
-                          f"{violation_type.replace('_', ' ').title()} nedeniyle uyarı", 
-                          interaction.user.id, datetime.now(ZoneInfo("UTC")).isoformat(), expires_at))
-                    await db.commit()
-                    cursor = await db.execute('''
-                        SELECT COUNT(*) FROM warnings 
-                        WHERE user_id = ? AND guild_id = ? AND violation_type = ? AND expires_at > ?
-                    ''', (self.user.id, interaction.guild_id, violation_type, datetime.now(ZoneInfo("UTC")).isoformat()))
-                    warn_count = (await cursor.fetchone())[0]
-
-                action, action_description = await self.apply_punishment(self.user, violation_type, warn_count, interaction)
-                await self.log_warning(interaction.guild, self.user, violation_type, 
-                                      f"{violation_type.replace('_', ' ').title()} nedeniyle uyarı", 
-                                      action, interaction.user)
+                action_description, _ = await self.issue_warning(interaction, violation_type)
                 embed = discord.Embed(
                     title="Uyarı Uygulandı",
                     description=f"{self.user.mention} uyarıldı. **Ceza:** {action_description}",
@@ -194,7 +196,7 @@ class UserInfoView(discord.ui.View):
                 embed.set_footer(text="Habsen Topluluğu")
                 await interaction.followup.send(embed=embed, ephemeral=True)
 
-        view = WarnSelect(self.user, self.apply_punishment, self.log_warning)
+        view = WarnSelect(self.user, self.issue_warning)
         embed = discord.Embed(
             title="Ceza Türü Seçimi",
             description="Aşağıdan bir ceza türü seçin.",
@@ -211,17 +213,11 @@ class UserInfoView(discord.ui.View):
 
         await interaction.response.defer(ephemeral=True)
 
-        async with aiosqlite.connect("warnings.db") as db:
-            cursor = await db.execute('''
-                SELECT * FROM jails 
-                WHERE user_id = ? AND guild_id = ? AND end_time > ?
-            ''', (self.user.id, interaction.guild_id, datetime.now(ZoneInfo("UTC")).isoformat()))
-            existing_jail = await cursor.fetchone()
+        existing_jail = await self.jail_repo.active(self.user.id, interaction.guild_id, epoch())
 
         if existing_jail:
-            end_time = datetime.fromisoformat(existing_jail[5])
-            remaining_time = (end_time - datetime.now(ZoneInfo("UTC"))).total_seconds()
-            hours, remainder = divmod(int(remaining_time), 3600)
+            remaining_time = existing_jail.end_time - epoch()
+            hours, remainder = divmod(remaining_time, 3600)
             minutes, seconds = divmod(remainder, 60)
             embed = discord.Embed(
                 title="Hata",
@@ -234,9 +230,10 @@ class UserInfoView(discord.ui.View):
             return
 
         class JailDurationSelect(discord.ui.View):
-            def __init__(self, user):
+            def __init__(self, user, jail_repo):
                 super().__init__(timeout=60)
                 self.user = user
+                self.jail_repo = jail_repo
 
             @discord.ui.select(
                 placeholder="Jail Süresi Seçin",
@@ -253,7 +250,6 @@ class UserInfoView(discord.ui.View):
                 end_time = start_time + timedelta(seconds=duration)
 
                 original_roles = [role.id for role in self.user.roles if role != interaction.guild.default_role]
-                original_roles_json = json.dumps(original_roles)
 
                 jail_role = interaction.guild.get_role(int(os.getenv("JAIL_ROLE_ID")))
                 if not jail_role:
@@ -269,13 +265,8 @@ class UserInfoView(discord.ui.View):
 
                 await self.user.edit(roles=[jail_role], reason="Moderatör tarafından jail'e atıldı")
 
-                async with aiosqlite.connect("warnings.db") as db:
-                    await db.execute('''
-                        INSERT INTO jails (user_id, guild_id, moderator_id, start_time, end_time, original_roles)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (self.user.id, interaction.guild_id, interaction.user.id, 
-                          start_time.isoformat(), end_time.isoformat(), original_roles_json))
-                    await db.commit()
+                await self.jail_repo.add(self.user.id, interaction.guild_id, interaction.user.id,
+                                         epoch(start_time), epoch(end_time), original_roles)
 
                 log_channel = interaction.guild.get_channel(int(os.getenv("LOG_CHANNEL_ID")))
                 if log_channel:
@@ -289,7 +280,7 @@ class UserInfoView(discord.ui.View):
                     embed.add_field(name="Sebep", value=f"Moderatör tarafından jail'e atıldı (Süre: {duration//3600} saat)")
                     embed.add_field(name="Moderatör", value=interaction.user.mention)
                     embed.set_footer(text="Habsen Topluluğu")
-                    await log_channel.send(embed=embed)
+                    log_publisher.publish(log_channel, embed)
 
                 embed = discord.Embed(
                     title="Jail Uygulandı",
@@ -300,7 +291,7 @@ class UserInfoView(discord.ui.View):
                 embed.set_footer(text="Habsen Topluluğu")
                 await interaction.followup.send(embed=embed, ephemeral=True)
 
-        view = JailDurationSelect(self.user)
+        view = JailDurationSelect(self.user, self.jail_repo)
         embed = discord.Embed(
             title="Jail Süresi Seçimi",
             description="Aşağıdan bir jail süresi seçin.",
@@ -329,7 +320,7 @@ class UserInfoView(discord.ui.View):
                 embed.add_field(name="Sebep", value="Kullanıcı atıldı")
                 embed.add_field(name="Moderatör", value=interaction.user.mention)
                 embed.set_footer(text="Habsen Topluluğu")
-                await log_channel.send(embed=embed)
+                log_publisher.publish(log_channel, embed)
             embed = discord.Embed(
                 title="Kullanıcı Atıldı",
                 description=f"{self.user.mention} sunucudan atıldı.",
@@ -369,7 +360,7 @@ class UserInfoView(discord.ui.View):
                 embed.add_field(name="Sebep", value="15 dakika susturuldu")
                 embed.add_field(name="Moderatör", value=interaction.user.mention)
                 embed.set_footer(text="Habsen Topluluğu")
-                await log_channel.send(embed=embed)
+                log_publisher.publish(log_channel, embed)
             embed = discord.Embed(
                 title="Zaman Aşımı Uygulandı",
                 description=f"{self.user.mention} 15 dakika susturuldu.",
@@ -407,7 +398,7 @@ class UserInfoView(discord.ui.View):
                 embed.add_field(name="Sebep", value="Kullanıcı banlandı")
                 embed.add_field(name="Moderatör", value=interaction.user.mention)
                 embed.set_footer(text="Habsen Topluluğu")
-                await log_channel.send(embed=embed)
+                log_publisher.publish(log_channel, embed)
             embed = discord.Embed(
                 title="Kullanıcı Banlandı",
                 description=f"{self.user.mention} sunucudan banlandı.",
@@ -462,12 +453,7 @@ class UserInfoView(discord.ui.View):
             await interaction.response.send_message("Bu işlemi yalnızca işlemi başlatan moderatör yapabilir!", ephemeral=True)
             return
         await interaction.response.defer(ephemeral=True)
-        async with aiosqlite.connect("warnings.db") as db:
-            cursor = await db.execute('''
-                SELECT * FROM warnings 
-                WHERE user_id = ? AND guild_id = ? AND expires_at > ?
-            ''', (self.user.id, interaction.guild_id, datetime.now(ZoneInfo("UTC")).isoformat()))
-            warnings = await cursor.fetchall()
+        warnings = await self.warning_repo.list_active(self.user.id, interaction.guild_id, epoch())
         view = WarningListView(warnings, self.user, interaction.user)
         embed = discord.Embed(
             title=f"{self.user.display_name} - Uyarı Listesi",
@@ -480,12 +466,7 @@ class UserInfoView(discord.ui.View):
         await interaction.followup.send(embed=embed, view=view, ephemeral=True)
 
     async def get_user_info_embed(self, member, moderator):
-        async with aiosqlite.connect("warnings.db") as db:
-            cursor = await db.execute('''
-                SELECT COUNT(*) FROM warnings 
-                WHERE user_id = ? AND guild_id = ? AND expires_at > ?
-            ''', (member.id, member.guild.id, datetime.now(ZoneInfo("UTC")).isoformat()))
-            warn_count = (await cursor.fetchone())[0]
+        warn_count = await self.warning_repo.count_active(member.id, member.guild.id, epoch())
         roles = ", ".join([role.mention for role in member.roles if role != member.guild.default_role]) or "Rol yok"
         embed = discord.Embed(
             title=f"{member.display_name} - Kullanıcı Bilgileri",
@@ -500,6 +481,40 @@ class UserInfoView(discord.ui.View):
         embed.set_footer(text="Habsen Topluluğu")
         return embed, self
 
+    async def issue_warning(self, interaction: discord.Interaction, violation_type: str):
+        # /warn ve Uyarı Ekle butonunun ortak akışı: tek veritabanı işi, ardından Discord tarafı
+        member = self.user
+        reason = f"{violation_type.replace('_', ' ').title()} nedeniyle uyarı"
+        now = datetime.now(ZoneInfo("UTC"))
+        _, warn_count, total_warnings = await self.warning_repo.add_and_count(
+            member.id, interaction.guild_id, violation_type, reason, interaction.user.id,
+            epoch(now), epoch(now + timedelta(days=1))
+        )
+
+        action, action_description = await self.apply_punishment(member, violation_type, warn_count, interaction)
+        # Kayıt, cezanın sonucunu içerdiği için cezadan sonra kuyruğa alınır; gönderim beklenmez
+        self.log_warning(interaction.guild, member, violation_type, reason, action, interaction.user)
+        if total_warnings >= 3:
+            # member.timeout nesneyi güncellemez; kuralın az önce verdiği süre ayrıca hesaba katılır
+            punished_until = member.timed_out_until
+            if action == "timeout":
+                rule = next(rule for rule in self.VIOLATION_RULES[violation_type] if rule["count"] == warn_count)
+                punished_until = max(filter(None, (punished_until, now + timedelta(seconds=rule["duration"]))))
+            await self.apply_auto_timeout(interaction, punished_until)
+        return action_description, warn_count
+
+    async def apply_auto_timeout(self, interaction: discord.Interaction, punished_until=None):
+        try:
+            duration = 900
+            until = datetime.now(ZoneInfo("UTC")) + timedelta(seconds=duration)
+            # Daha uzun süren bir susturma 15 dakikalık otomatik ceza ile kısaltılmaz
+            if punished_until and punished_until >= until:
+                return
+            await self.user.timeout(until, reason="3 uyarıya ulaşıldı")
+            self.log_warning(interaction.guild, self.user, "otomatik_timeout", "3 uyarıya ulaşıldı", "timeout", interaction.user)
+        except discord.Forbidden:
+            pass
+
     async def apply_punishment(self, member: discord.Member, violation_type: str, warn_count: int, interaction: discord.Interaction):
         rules = self.VIOLATION_RULES.get(violation_type, [])
         for rule in rules:
@@ -518,7 +533,7 @@ class UserInfoView(discord.ui.View):
                         return "error", f"{member.mention} için ceza uygulanamadı! Botun izinlerini kontrol edin."
         return "warn", "Uyarı"
 
-    async def log_warning(self, guild: discord.Guild, user: discord.Member, violation_type: str, reason: str, action: str, moderator: discord.Member):
+    def log_warning(self, guild: discord.Guild, user: discord.Member, violation_type: str, reason: str, action: str, moderator: discord.Member):
         log_channel = guild.get_channel(int(os.getenv("LOG_CHANNEL_ID")))
         if not log_channel:
             return
@@ -552,12 +567,29 @@ class UserInfoView(discord.ui.View):
         embed.add_field(name="Kullanıcı", value=user.mention)
         embed.add_field(name="Sebep", value=reason)
         embed.add_field(name="Moderatör", value=moderator.mention)
-        await log_channel.send(embed=embed)
+        log_publisher.publish(log_channel, embed)
 
 class Moderation(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.check_jails.start()
+        self.warning_counters = WarningCounters()
+        self.warning_repo = WarningRepo(bot.db, self.warning_counters)
+        self.jail_scheduler = DeadlineScheduler(self.release_jails, "Jail zamanlayıcısı")
+        self.jail_repo = JailRepo(bot.db, self.jail_scheduler)
+        self.release_slots = asyncio.Semaphore(int(os.getenv("JAIL_RELEASE_CONCURRENCY", "5")))
+        self.release_failures = {}
+        self.archive_history.start()
+
+    async def cog_load(self):
+        loaded = await self.warning_repo.warm_counters(epoch())
+        logger.info(f"Uyarı sayaçları yüklendi: {loaded} aktif uyarı")
+        scheduled = await self.jail_repo.schedule_pending()
+        logger.info(f"Jail zamanlayıcısı yüklendi: {scheduled} bekleyen jail")
+        self.jail_scheduler.start()
+
+    async def cog_unload(self):
+        await self.jail_scheduler.stop()
+        self.archive_history.cancel()
 
     async def check_moderator(self, interaction: discord.Interaction):
         moderator_role = interaction.guild.get_role(int(os.getenv("MODERATOR_ROLE_ID")))
@@ -602,25 +634,9 @@ class Moderation(commands.Cog):
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
 
-        reason = f"{violation_type.replace('_', ' ').title()} nedeniyle uyarı"
-        async with aiosqlite.connect("warnings.db") as db:
-            expires_at = (datetime.now(ZoneInfo("UTC")) + timedelta(days=1)).isoformat()
-            await db.execute('''
-                INSERT INTO warnings (user_id, guild_id, violation_type, reason, moderator_id, timestamp, expires_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (member.id, interaction.guild_id, violation_type, reason, interaction.user.id, 
-                  datetime.now(ZoneInfo("UTC")).isoformat(), expires_at))
-            await db.commit()
-            cursor = await db.execute('''
-                SELECT COUNT(*) FROM warnings 
-                WHERE user_id = ? AND guild_id = ? AND violation_type = ? AND expires_at > ?
-            ''', (member.id, interaction.guild_id, violation_type, datetime.now(ZoneInfo("UTC")).isoformat()))
-            warn_count = (await cursor.fetchone())[0]
-
         await interaction.response.defer(ephemeral=True)
-        view = UserInfoView(member, interaction.user)
-        action, action_description = await view.apply_punishment(member, violation_type, warn_count, interaction)
-        await view.log_warning(interaction.guild, member, violation_type, reason, action, interaction.user)
+        view = UserInfoView(member, interaction.user, self.warning_repo, self.jail_repo)
+        action_description, warn_count = await view.issue_warning(interaction, violation_type)
 
         embed = discord.Embed(
             title="Uyarı Uygulandı",
@@ -631,47 +647,30 @@ class Moderation(commands.Cog):
         embed.set_footer(text="Habsen Topluluğu")
         await interaction.followup.send(embed=embed, ephemeral=True)
 
-        async with aiosqlite.connect("warnings.db") as db:
-            cursor = await db.execute('''
-                SELECT COUNT(*) FROM warnings 
-                WHERE user_id = ? AND guild_id = ? AND expires_at > ?
-            ''', (member.id, interaction.guild_id, datetime.now(ZoneInfo("UTC")).isoformat()))
-            total_warnings = (await cursor.fetchone())[0]
-
-        if total_warnings >= 3:
-            try:
-                duration = 900
-                until = datetime.now(ZoneInfo("UTC")) + timedelta(seconds=duration)
-                await member.timeout(until, reason="3 uyarıya ulaşıldı")
-                await view.log_warning(interaction.guild, member, "otomatik_timeout", "3 uyarıya ulaşıldı", "timeout", interaction.user)
-            except discord.Forbidden:
-                pass
-
     @app_commands.command(name="user", description="Bir kullanıcının bilgilerini gösterir")
     @app_commands.describe(member="Bilgileri görüntülenecek kullanıcı")
     async def user(self, interaction: discord.Interaction, member: discord.Member):
         if not await self.check_moderator(interaction):
             return
         await interaction.response.defer(ephemeral=True)
-        view = UserInfoView(member, interaction.user)
+        view = UserInfoView(member, interaction.user, self.warning_repo, self.jail_repo)
         embed, view = await view.get_user_info_embed(member, interaction.user)
         await interaction.followup.send(embed=embed, view=view, ephemeral=True)
 
     @app_commands.command(name="warnlist", description="Bir kullanıcının uyarılarını listeler")
-    @app_commands.describe(member="Uyarıları görüntülenecek kullanıcı")
-    async def warnlist(self, interaction: discord.Interaction, member: discord.Member):
+    @app_commands.describe(member="Uyarıları görüntülenecek kullanıcı", gecmis="Süresi dolmuş ve arşivlenmiş uyarıları göster")
+    async def warnlist(self, interaction: discord.Interaction, member: discord.Member, gecmis: bool = False):
         if not await self.check_moderator(interaction):
             return
         await interaction.response.defer(ephemeral=True)
-        async with aiosqlite.connect("warnings.db") as db:
-            cursor = await db.execute('''
-                SELECT * FROM warnings 
-                WHERE user_id = ? AND guild_id = ? AND expires_at > ?
-            ''', (member.id, interaction.guild_id, datetime.now(ZoneInfo("UTC")).isoformat()))
-            warnings = await cursor.fetchall()
-        view = WarningListView(warnings, member, interaction.user)
+        if gecmis:
+            warnings = await self.warning_repo.list_history(member.id, interaction.guild_id)
+            view = WarningListView(warnings, member, interaction.user, title="Uyarı Geçmişi")
+        else:
+            warnings = await self.warning_repo.list_active(member.id, interaction.guild_id, epoch())
+            view = WarningListView(warnings, member, interaction.user)
         embed = discord.Embed(
-            title=f"{member.display_name} - Uyarı Listesi",
+            title=f"{member.display_name} - {view.title}",
             description=view.get_page_content(),
             color=0x800080,
             timestamp=datetime.now(ZoneInfo("UTC"))
@@ -687,12 +686,7 @@ class Moderation(commands.Cog):
             return
 
         await interaction.response.defer(ephemeral=True)
-        async with aiosqlite.connect("warnings.db") as db:
-            cursor = await db.execute('''
-                SELECT * FROM warnings 
-                WHERE user_id = ? AND guild_id = ? AND expires_at > ?
-            ''', (member.id, interaction.guild_id, datetime.now(ZoneInfo("UTC")).isoformat()))
-            warnings = await cursor.fetchall()
+        warnings = await self.warning_repo.list_active(member.id, interaction.guild_id, epoch())
 
         if not warnings:
             embed = discord.Embed(
@@ -706,20 +700,21 @@ class Moderation(commands.Cog):
             return
 
         class UnwarnSelect(discord.ui.View):
-            def __init__(self, warnings, user, moderator):
+            def __init__(self, warnings, user, moderator, warning_repo):
                 super().__init__(timeout=60)
                 self.warnings = warnings
                 self.user = user
                 self.moderator = moderator
+                self.warning_repo = warning_repo
 
             @discord.ui.select(
                 placeholder="Kaldırılacak Uyarıyı Seçin",
                 options=[
                     discord.SelectOption(
-                        label=f"ID: {w[0]} - {w[3].replace('_', ' ').title()}",
-                        value=str(w[0]),
-                        description=f"Sebep: {w[4][:50]}..."
-                    ) for w in self.warnings
+                        label=f"ID: {w.id} - {w.violation_type.replace('_', ' ').title()}",
+                        value=str(w.id),
+                        description=f"Sebep: {w.reason[:50]}..."
+                    ) for w in warnings
                 ]
             )
             async def select_callback(self, interaction: discord.Interaction, select: discord.ui.Select):
@@ -736,9 +731,7 @@ class Moderation(commands.Cog):
                     return
 
                 warning_id = int(select.values[0])
-                async with aiosqlite.connect("warnings.db") as db:
-                    await db.execute('DELETE FROM warnings WHERE id = ?', (warning_id,))
-                    await db.commit()
+                await self.warning_repo.delete(interaction.guild_id, warning_id)
 
                 log_channel = interaction.guild.get_channel(int(os.getenv("LOG_CHANNEL_ID")))
                 if log_channel:
@@ -751,7 +744,7 @@ class Moderation(commands.Cog):
                     embed.add_field(name="Uyarı ID", value=str(warning_id))
                     embed.add_field(name="Moderatör", value=interaction.user.mention)
                     embed.set_footer(text="Habsen Topluluğu")
-                    await log_channel.send(embed=embed)
+                    log_publisher.publish(log_channel, embed)
 
                 embed = discord.Embed(
                     title="Uyarı Kaldırıldı",
@@ -762,7 +755,7 @@ class Moderation(commands.Cog):
                 embed.set_footer(text="Habsen Topluluğu")
                 await interaction.followup.send(embed=embed, view=None)
 
-        view = UnwarnSelect(warnings, member, interaction.user)
+        view = UnwarnSelect(warnings, member, interaction.user, self.warning_repo)
         embed = discord.Embed(
             title="Uyarı Seçimi",
             description="Aşağıdan kaldırılacak uyarıyı seçin.",
@@ -779,12 +772,12 @@ class Moderation(commands.Cog):
             return
 
         await interaction.response.defer(ephemeral=True)
-        async with aiosqlite.connect("warnings.db") as db:
-            cursor = await db.execute('''
-                SELECT * FROM jails 
-                WHERE user_id = ? AND guild_id = ? AND end_time > ?
-            ''', (member.id, interaction.guild_id, datetime.now(ZoneInfo("UTC")).isoformat()))
-            jail = await cursor.fetchone()
+        jail = await self.jail_repo.active(member.id, interaction.guild_id, epoch())
+        if jail:
+            # Roller kayıt silinmeden okunur; release zamanlayıcı ile yarışırsa yalnızca biri kazanır
+            restore = await self.jail_repo.roles_for(interaction.guild_id, [jail.id])
+            if not await self.jail_repo.release(interaction.guild_id, jail.id):
+                jail = None
 
         if not jail:
             embed = discord.Embed(
@@ -797,18 +790,25 @@ class Moderation(commands.Cog):
             await interaction.followup.send(embed=embed, ephemeral=True)
             return
 
-        jail_role = interaction.guild.get_role(int(os.getenv("JAIL_ROLE_ID")))
-        if jail_role in member.roles:
-            await member.remove_roles(jail_role, reason="Moderatör tarafından jail kaldırıldı")
-
-        original_roles = json.loads(jail[6])
-        roles = [interaction.guild.get_role(role_id) for role_id in original_roles if interaction.guild.get_role(role_id)]
-        if roles:
-            await member.add_roles(*roles, reason="Jail kaldırıldı, eski roller geri yüklendi")
-
-        async with aiosqlite.connect("warnings.db") as db:
-            await db.execute('DELETE FROM jails WHERE id = ?', (jail[0],))
-            await db.commit()
+        guild_roles = {role.id: role for role in interaction.guild.roles}
+        jail_role = guild_roles.get(int(os.getenv("JAIL_ROLE_ID")))
+        try:
+            await member.edit(roles=released_roles(member, restore[jail.id], guild_roles, jail_role),
+                              reason="Jail kaldırıldı, eski roller geri yüklendi")
+        except discord.HTTPException as e:
+            # Kayıt geri alınır; jail süresi dolduğunda zamanlayıcı yeniden dener
+            await self.jail_repo.reinstate(jail, jail.end_time)
+            embed = discord.Embed(
+                title="Hata",
+                description=f"{member.mention} kullanıcısının rolleri geri verilemedi, jail kaldırılmadı. "
+                            f"Botun rol sırasını ve izinlerini kontrol edin.",
+                color=0xff0000,
+                timestamp=datetime.now(ZoneInfo("UTC"))
+            )
+            embed.add_field(name="Hata", value=str(e)[:1024])
+            embed.set_footer(text="Habsen Topluluğu")
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
 
         log_channel = interaction.guild.get_channel(int(os.getenv("LOG_CHANNEL_ID")))
         if log_channel:
@@ -821,7 +821,7 @@ class Moderation(commands.Cog):
             embed.add_field(name="Kullanıcı", value=member.mention)
             embed.add_field(name="Moderatör", value=interaction.user.mention)
             embed.set_footer(text="Habsen Topluluğu")
-            await log_channel.send(embed=embed)
+            log_publisher.publish(log_channel, embed)
 
         embed = discord.Embed(
             title="Jail Kaldırıldı",
@@ -832,35 +832,85 @@ class Moderation(commands.Cog):
         embed.set_footer(text="Habsen Topluluğu")
         await interaction.followup.send(embed=embed, ephemeral=True)
 
-    @tasks.loop(minutes=1)
-    async def check_jails(self):
-        async with aiosqlite.connect("warnings.db") as db:
-            cursor = await db.execute('''
-                SELECT * FROM jails 
-                WHERE end_time <= ?
-            ''', (datetime.now(ZoneInfo("UTC")).isoformat(),))
-            expired_jails = await cursor.fetchall()
-
-        for jail in expired_jails:
-            guild = self.bot.get_guild(jail[2])
+    async def release_jails(self, jails):
+        # Zamanlayıcı süresi dolan jail'leri toplu verir; roller sunucu başına tek sorguda okunur,
+        # üyeler sınırlı eşzamanlılıkla serbest bırakılır
+        jail_role_id = int(os.getenv("JAIL_ROLE_ID"))
+        by_guild = {}
+        for jail in jails:
+            by_guild.setdefault(jail.guild_id, []).append(jail)
+        releases = []
+        for guild_id, guild_jails in by_guild.items():
+            guild = self.bot.get_guild(guild_id)
             if not guild:
+                # Sunucu henüz önbellekte değil ya da erişilemiyor; jail'ler yığından çıktığı için yeniden kurulur
+                for jail in guild_jails:
+                    delay = self.retry_later(jail)
+                logger.warning(f"{guild_id} sunucusuna erişilemedi, {len(guild_jails)} jail {delay} sn sonra yeniden denenecek")
                 continue
-            member = await guild.fetch_member(jail[1])
-            if not member:
-                continue
-
-            jail_role = guild.get_role(int(os.getenv("JAIL_ROLE_ID")))
-            if jail_role in member.roles:
-                await member.remove_roles(jail_role, reason="Jail süresi doldu")
-
-            original_roles = json.loads(jail[6])
-            roles = [guild.get_role(role_id) for role_id in original_roles if guild.get_role(role_id)]
-            if roles:
-                await member.add_roles(*roles, reason="Jail süresi doldu, eski roller geri yüklendi")
-
-            async with aiosqlite.connect("warnings.db") as db:
-                await db.execute('DELETE FROM jails WHERE id = ?', (jail[0],))
-                await db.commit()
+            restore = await self.jail_repo.roles_for(guild_id, [jail.id for jail in guild_jails])
+            guild_roles = {role.id: role for role in guild.roles}
+            for jail in guild_jails:
+                releases.append(self.release_jail(guild, jail, restore[jail.id], guild_roles, guild_roles.get(jail_role_id)))
+        await asyncio.gather(*releases)
+
+    def retry_delay(self, jail):
+        # Aynı jail art arda başarısız oldukça bekleme ikiye katlanır, JAIL_MAX_RETRY_DELAY ile sınırlıdır
+        failures = self.release_failures.get((jail.guild_id, jail.id), 0)
+        self.release_failures[(jail.guild_id, jail.id)] = failures + 1
+        return min(JAIL_RETRY_DELAY * 2 ** failures, JAIL_MAX_RETRY_DELAY)
+
+    def retry_later(self, jail):
+        # Kayıt veritabanında durduğu için yalnızca zamanlayıcıya yeniden eklenir
+        delay = self.retry_delay(jail)
+        self.jail_scheduler.schedule(epoch() + delay, jail)
+        return delay
+
+    async def release_jail(self, guild, jail, role_ids, guild_roles, jail_role):
+        async with self.release_slots:
+            member = guild.get_member(jail.user_id)
+            if member is None and not guild.chunked:
+                try:
+                    member = await guild.fetch_member(jail.user_id)
+                except discord.NotFound:
+                    member = None
+                except discord.HTTPException as e:
+                    delay = self.retry_later(jail)
+                    logger.error(f"Jail için üye alınamadı, {delay} sn sonra yeniden denenecek "
+                                 f"(jail_id: {jail.id}, user_id: {jail.user_id}): {str(e)}")
+                    return
+            if member is None:
+                # Üye sunucudan ayrılmış; geri verilecek rolü kalmadığı için kayıt doğrudan geçmişe taşınır
+                self.release_failures.pop((guild.id, jail.id), None)
+                if await self.jail_repo.release(guild.id, jail.id):
+                    logger.info(f"Jail üye sunucuda olmadığı için arşivlendi (jail_id: {jail.id}, user_id: {jail.user_id})")
+                return
+            if not await self.jail_repo.release(guild.id, jail.id):
+                return
+            try:
+                await member.edit(roles=released_roles(member, role_ids, guild_roles, jail_role),
+                                  reason="Jail süresi doldu, eski roller geri yüklendi")
+            except discord.HTTPException as e:
+                # Kayıt geri alınır ve artan aralıklarla yeniden denenir; ilk hatada moderatörler bilgilendirilir
+                failures = self.release_failures.get((guild.id, jail.id), 0)
+                delay = self.retry_delay(jail)
+                await self.jail_repo.reinstate(jail, epoch() + delay)
+                logger.error(f"Jail kaldırılamadı, {delay} sn sonra yeniden denenecek "
+                             f"(jail_id: {jail.id}, user_id: {jail.user_id}): {str(e)}")
+                log_channel = guild.get_channel(int(os.getenv("LOG_CHANNEL_ID")))
+                if log_channel and failures == 0:
+                    embed = discord.Embed(
+                        title="Jail Kaldırılamadı",
+                        description=f"{member.mention} kullanıcısının jail süresi doldu ancak rolleri geri verilemedi. "
+                                    f"Botun rol sırasını ve izinlerini kontrol edin; işlem otomatik olarak yeniden denenecek.",
+                        color=0x808080,
+                        timestamp=datetime.now(ZoneInfo("UTC"))
+                    )
+                    embed.add_field(name="Hata", value=str(e)[:1024])
+                    embed.set_footer(text="Habsen Topluluğu")
+                    log_publisher.publish(log_channel, embed)
+                return
+            self.release_failures.pop((guild.id, jail.id), None)
 
             log_channel = guild.get_channel(int(os.getenv("LOG_CHANNEL_ID")))
             if log_channel:
@@ -871,7 +921,14 @@ class Moderation(commands.Cog):
                     timestamp=datetime.now(ZoneInfo("UTC"))
                 )
                 embed.set_footer(text="Habsen Topluluğu")
-                await log_channel.send(embed=embed)
+                log_publisher.publish(log_channel, embed)
+
+    @tasks.loop(minutes=10)
+    async def archive_history(self):
+        now = epoch()
+        self.warning_counters.expire(now)
+        warning_retention = int(os.getenv("WARNING_RETENTION_DAYS", "0")) * 86400
+        await self.warning_repo.archive_expired(now - warning_retention)
 
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
@@ -886,7 +943,7 @@ class Moderation(commands.Cog):
             embed.add_field(name="Kullanıcı", value=f"{member.name}#{member.discriminator}")
             embed.add_field(name="Katılım Tarihi", value=member.joined_at.strftime('%Y-%m-%d %H:%M'))
             embed.set_footer(text="Habsen Topluluğu")
-            await log_channel.send(embed=embed)
+            log_publisher.publish(log_channel, embed)
 
     @commands.Cog.listener()
     async def on_member_remove(self, member: discord.Member):
@@ -900,7 +957,7 @@ class Moderation(commands.Cog):
             )
             embed.add_field(name="Kullanıcı", value=f"{member.name}#{member.discriminator}")
             embed.set_footer(text="Habsen Topluluğu")
-            await log_channel.send(embed=embed)
+            log_publisher.publish(log_channel, embed)
 
 async def setup(bot):
     await bot.add_cog(Moderation(bot))
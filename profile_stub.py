@@ -0,0 +1,88 @@
+import asyncio
+from aiohttp import web
+import html
+import logging
+import os
+import sys
+
+logger = logging.getLogger("HabsenBot")
+
+# habsen.com.tr profil sayfasının çevrimdışı yerine geçeni. Kullanıcı adının ön eki yanıtı belirler:
+#   yok_    -> "hiç kullanıcı bulunamadı" sayfası
+#   kodlu_  -> mottosunda STUB_CODE bulunan profil
+#   yavas_  -> STUB_SLOW_DELAY saniye gecikmeli normal profil
+#   hata_   -> 500 yanıtı
+#   diğer   -> kodsuz mottolu normal profil
+STUB_CODE = os.getenv("STUB_CODE", "KOD-TEST01")
+STUB_SLOW_DELAY = float(os.getenv("STUB_SLOW_DELAY", "2"))
+
+PROFILE_PAGE = '''<!DOCTYPE html>
+<html lang="tr">
+<head>
+    <meta charset="utf-8">
+    <title>{username} - Habsen</title>
+    <style>.motto {{ font-style: italic; }}</style>
+    <script>window.__PROFILE__ = {{"name": "{username}"}};</script>
+</head>
+<body>
+    <header><nav><a href="/">Ana Sayfa</a> <a href="/topluluk">Topluluk</a></nav></header>
+    <main class="profile">
+        <div class="profile-card">
+            <img src="/avatar/{username}.png" alt="{username}">
+            <h1>{username}</h1>
+            <div class="profile-motto"><span class="motto">{motto}</span></div>
+            <ul class="profile-stats">
+                <li><span>Arkadaş</span> <b>42</b></li>
+                <li><span>Rozet</span> <b>7</b></li>
+            </ul>
+        </div>
+    </main>
+    <footer><span>© Habsen</span></footer>
+</body>
+</html>
+'''
+
+NOT_FOUND_PAGE = '''<!DOCTYPE html>
+<html lang="tr">
+<head><meta charset="utf-8"><title>Habsen</title></head>
+<body>
+    <header><nav><a href="/">Ana Sayfa</a></nav></header>
+    <main><div class="alert">Hiç kullanıcı bulunamadı!</div></main>
+    <footer><span>© Habsen</span></footer>
+</body>
+</html>
+'''
+
+def profile_page(username, motto):
+    return PROFILE_PAGE.format(username=html.escape(username), motto=html.escape(motto).replace(" ", "&nbsp;", 1))
+
+async def profile(request):
+    username = request.match_info["username"]
+    if username.startswith("hata_"):
+        return web.Response(status=500, text="Internal Server Error")
+    if username.startswith("yok_"):
+        return web.Response(status=404, text=NOT_FOUND_PAGE, content_type="text/html")
+    if username.startswith("yavas_"):
+        await asyncio.sleep(STUB_SLOW_DELAY)
+    motto = STUB_CODE if username.startswith("kodlu_") else "Habsen'de her gün yeni bir macera!"
+    return web.Response(text=profile_page(username, motto), content_type="text/html")
+
+def create_app():
+    app = web.Application()
+    app.router.add_get("/profile/{username}", profile)
+    return app
+
+async def start_stub(host="127.0.0.1", port=0):
+    # Çalışan sunucunun runner'ı ve HABSEN_PROFILE_URL biçimindeki adresi döner
+    runner = web.AppRunner(create_app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://{host}:{port}/profile/{{username}}"
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8099
+    logger.info(f"HABSEN_PROFILE_URL=http://127.0.0.1:{port}/profile/{{username}}")
+    web.run_app(create_app(), host="127.0.0.1", port=port, access_log=None)
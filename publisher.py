@@ -0,0 +1,226 @@
+import aiohttp
+import asyncio
+from collections import OrderedDict, deque
+import discord
+import logging
+import os
+import time
+
+logger = logging.getLogger("HabsenBot")
+
+# Discord bir mesajda en fazla 10 embed ve toplam 6000 karakter kabul eder
+MAX_EMBEDS = 10
+MAX_EMBED_CHARS = 6000
+
+class LogPublisher:
+    # Log kanallarına giden embedler kanal başına kuyruğa alınır; moderatör işlemi gönderimi beklemez.
+    # Her kanalın tek bir gönderici görevi vardır: ilk embedden sonra flush_interval kadar bekler, biriken
+    # embedleri 10'arlı mesajlarda yollar ve aynı kanala iki mesaj arasında en az min_interval bırakır
+    def __init__(self, flush_interval=1.0, min_interval=1.0, max_queue=1000):
+        self.flush_interval = flush_interval
+        self.min_interval = min_interval
+        self.max_queue = max_queue
+        self._channels = {}
+        self._workers = {}
+        self.published = 0
+        self.messages = 0
+        self.dropped = 0
+        self.rate_limited = 0
+
+    def publish(self, channel, embed):
+        entry = self._channels.get(channel.id)
+        if entry is None:
+            entry = self._channels[channel.id] = (channel, deque(), asyncio.Event())
+        _, pending, ready = entry
+        if len(pending) >= self.max_queue:
+            self.dropped += 1
+            logger.warning(f"{channel.id} log kuyruğu dolu, embed atlandı")
+            return
+        pending.append(embed)
+        ready.set()
+        self.published += 1
+        worker = self._workers.get(channel.id)
+        if worker is None or worker.done():
+            self._workers[channel.id] = asyncio.create_task(self._run(*entry))
+
+    def _take(self, pending):
+        batch = [pending.popleft()]
+        size = len(batch[0])
+        while pending and len(batch) < MAX_EMBEDS and size + len(pending[0]) <= MAX_EMBED_CHARS:
+            size += len(pending[0])
+            batch.append(pending.popleft())
+        return batch
+
+    async def _run(self, channel, pending, ready):
+        last_sent = 0.0
+        while True:
+            if not pending:
+                ready.clear()
+                await ready.wait()
+            if len(pending) < MAX_EMBEDS:
+                await asyncio.sleep(self.flush_interval)
+            wait = last_sent + self.min_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self._send(channel, self._take(pending))
+            last_sent = time.monotonic()
+
+    async def _send(self, channel, batch):
+        for attempt in range(3):
+            try:
+                await channel.send(embeds=batch)
+                self.messages += 1
+                return
+            except discord.RateLimited as e:
+                self.rate_limited += 1
+                await asyncio.sleep(e.retry_after)
+            except discord.HTTPException as e:
+                if e.status != 429:
+                    logger.error(f"{channel.id} kanalına log gönderilemedi: {str(e)}")
+                    return
+                self.rate_limited += 1
+                await asyncio.sleep(float(e.response.headers.get("Retry-After", 1)))
+        logger.error(f"{channel.id} kanalına log gönderilemedi: hız sınırı aşıldı, {len(batch)} embed atlandı")
+
+    async def close(self):
+        # Kapanışta bekleyen embedler beklemeden gönderilir
+        for worker in self._workers.values():
+            worker.cancel()
+        await asyncio.gather(*self._workers.values(), return_exceptions=True)
+        self._workers = {}
+        for channel, pending, _ in self._channels.values():
+            while pending:
+                await self._send(channel, self._take(pending))
+        self._channels = {}
+
+    def stats(self):
+        return {
+            "kuyruğa alınan": self.published,
+            "gönderilen mesaj": self.messages,
+            "bekleyen": sum(len(pending) for _, pending, _ in self._channels.values()),
+            "atlanan": self.dropped,
+            "hız sınırı": self.rate_limited,
+        }
+
+class DMDispatcher:
+    # Özel mesajlar sınırlı bir kuyruktan birkaç görevle gönderilir; çağıran taraf yalnızca kuyruğa ekler.
+    # DM kanalları önbellekte tutulur, DM'leri kapalı kullanıcılar (Forbidden) closed_ttl boyunca atlanır,
+    # geçici hatalar (429, 5xx, bağlantı) üstel bekleme ile yeniden denenir
+    def __init__(self, workers=2, max_queue=500, attempts=3, backoff=1.0, closed_ttl=21600, max_channels=1000):
+        self.workers = workers
+        self.attempts = attempts
+        self.backoff = backoff
+        self.closed_ttl = closed_ttl
+        self.max_channels = max_channels
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._tasks = []
+        self._channels = OrderedDict()
+        self._closed = {}
+        self.sent = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.failed = 0
+        self.retried = 0
+
+    def dms_closed(self, user_id):
+        closed_until = self._closed.get(user_id)
+        if closed_until is None:
+            return False
+        if time.monotonic() >= closed_until:
+            del self._closed[user_id]
+            return False
+        return True
+
+    def send(self, user, embed):
+        if self.dms_closed(user.id):
+            self.skipped += 1
+            return False
+        try:
+            self._queue.put_nowait((user, embed))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"DM kuyruğu dolu, {user.id} kullanıcısına mesaj atlandı")
+            return False
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._run()))
+        return True
+
+    async def _channel(self, user):
+        channel = self._channels.get(user.id)
+        if channel is None:
+            channel = user.dm_channel or await user.create_dm()
+            self._channels[user.id] = channel
+            if len(self._channels) > self.max_channels:
+                self._channels.popitem(last=False)
+        else:
+            self._channels.move_to_end(user.id)
+        return channel
+
+    async def _run(self):
+        while True:
+            user, embed = await self._queue.get()
+            try:
+                await self._deliver(user, embed)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, user, embed):
+        for attempt in range(self.attempts):
+            if self.dms_closed(user.id):
+                self.skipped += 1
+                return
+            try:
+                channel = await self._channel(user)
+                await channel.send(embed=embed)
+                self.sent += 1
+                return
+            except discord.Forbidden:
+                self._closed[user.id] = time.monotonic() + self.closed_ttl
+                self._channels.pop(user.id, None)
+                self.skipped += 1
+                return
+            except discord.NotFound:
+                self._channels.pop(user.id, None)
+                self.failed += 1
+                return
+            except discord.HTTPException as e:
+                if e.status != 429 and e.status < 500:
+                    logger.error(f"{user.id} kullanıcısına DM gönderilemedi: {str(e)}")
+                    self.failed += 1
+                    return
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError):
+                pass
+            if attempt + 1 < self.attempts:
+                self.retried += 1
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+        self.failed += 1
+        logger.error(f"{user.id} kullanıcısına DM gönderilemedi: {self.attempts} deneme başarısız")
+
+    async def close(self, timeout=5):
+        # Kuyrukta kalan mesajlara kısa bir süre tanınır, ardından görevler durdurulur
+        if self._tasks:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Kapanışta {self._queue.qsize()} DM gönderilemedi")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self):
+        return {
+            "gönderilen": self.sent,
+            "bekleyen": self._queue.qsize(),
+            "DM kapalı (atlanan)": self.skipped,
+            "kapalı bilinen": len(self._closed),
+            "yeniden deneme": self.retried,
+            "başarısız": self.failed,
+            "kuyruk dolu": self.dropped,
+        }
+
+log_publisher = LogPublisher(flush_interval=float(os.getenv("LOG_FLUSH_INTERVAL", "1")),
+                             min_interval=float(os.getenv("LOG_MIN_INTERVAL", "1")))
+dm_dispatcher = DMDispatcher(workers=int(os.getenv("DM_WORKERS", "2")),
+                             max_queue=int(os.getenv("DM_MAX_QUEUE", "500")))
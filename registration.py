@@ -1,13 +1,68 @@
+import asyncio
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 import random
 import string
 from datetime import datetime
 from zoneinfo import ZoneInfo
-from utils.helpers import check_username_validity, check_motto
+from utils.helpers import (check_username_validity, check_motto, browser_pool, username_cache,
+                           UpstreamUnavailable, SELENIUM_FALLBACK)
+from publisher import dm_dispatcher
+import logging
 import os
 
+logger = logging.getLogger("HabsenBot")
+
+# Arka plan doğrulayıcısı: bekleyen kodlar AUTO_VERIFY_INTERVAL saniyede bir, en fazla AUTO_VERIFY_BATCH profil denetlenir
+AUTO_VERIFY = os.getenv("AUTO_VERIFY", "0") == "1"
+AUTO_VERIFY_INTERVAL = int(os.getenv("AUTO_VERIFY_INTERVAL", "5"))
+AUTO_VERIFY_BATCH = int(os.getenv("AUTO_VERIFY_BATCH", "10"))
+AUTO_VERIFY_BACKOFF = int(os.getenv("AUTO_VERIFY_BACKOFF", "15"))
+AUTO_VERIFY_MAX_BACKOFF = int(os.getenv("AUTO_VERIFY_MAX_BACKOFF", "240"))
+VERIFICATION_EXPIRY_MARGIN = int(os.getenv("VERIFICATION_EXPIRY_MARGIN", "30"))
+
+async def grant_verified_role(guild, user_id, username):
+    member = await guild.fetch_member(user_id)
+    role = guild.get_role(int(os.getenv("VERIFIED_ROLE_ID")))
+    if not role:
+        return None
+    try:
+        await member.add_roles(role)
+        embed = discord.Embed(
+            title="Doğrulama Başarılı",
+            description="Habsen profilindeki kod doğrulandı. **Doğrulanmış** rolü verildi.",
+            color=0x00ff00,
+            timestamp=datetime.now(ZoneInfo("UTC"))
+        )
+        embed.add_field(name="Habsen Kullanıcı Adı", value=f"**{username}**", inline=False)
+    except discord.Forbidden:
+        embed = discord.Embed(
+            title="İzin Hatası",
+            description="Rol eklenemedi. Botun izinlerini kontrol edin.",
+            color=0xffff00,
+            timestamp=datetime.now(ZoneInfo("UTC"))
+        )
+    embed.set_footer(text="Habsen Topluluğu")
+    return embed
+
+def unavailable_embed():
+    embed = discord.Embed(
+        title="Habsen'e Ulaşılamıyor",
+        description="Habsen profil sayfası şu anda yanıt vermiyor. Lütfen birkaç dakika sonra tekrar deneyin.",
+        color=0xffff00,
+        timestamp=datetime.now(ZoneInfo("UTC"))
+    )
+    embed.set_footer(text="Habsen Topluluğu")
+    return embed
+
+def claim_verification(verification_codes, user_id, entry):
+    # Buton ve arka plan doğrulayıcısı aynı kodu iki kez işlemesin; yeni bir /kayıt kodu da eskisiyle karışmasın
+    if verification_codes.get(user_id) is not entry:
+        return False
+    del verification_codes[user_id]
+    return True
+
 class VerifyButton(discord.ui.View):
     def __init__(self, user_id, username, code, verification_codes):
         super().__init__(timeout=None)
@@ -30,7 +85,7 @@ class VerifyButton(discord.ui.View):
             return
 
         if self.user_id not in self.verification_codes or datetime.now(ZoneInfo("UTC")).timestamp() > self.verification_codes[self.user_id]["expires_at"]:
-            del self.verification_codes[self.user_id]
+            self.verification_codes.pop(self.user_id, None)
             self.children[0].disabled = True
             await interaction.message.edit(view=self)
             embed = discord.Embed(
@@ -44,32 +99,28 @@ class VerifyButton(discord.ui.View):
             return
 
         await interaction.response.defer(ephemeral=True)
-        is_valid = await check_motto(self.username, self.code)
+        entry = self.verification_codes.get(self.user_id)
+        try:
+            is_valid = await check_motto(self.username, self.code)
+        except UpstreamUnavailable:
+            await interaction.followup.send(embed=unavailable_embed(), ephemeral=True)
+            return
         if is_valid:
-            member = await interaction.guild.fetch_member(self.user_id)
-            role = interaction.guild.get_role(int(os.getenv("VERIFIED_ROLE_ID")))
-            if role:
-                try:
-                    await member.add_roles(role)
-                    embed = discord.Embed(
-                        title="Doğrulama Başarılı",
-                        description="Habsen profilindeki kod doğrulandı. **Doğrulanmış** rolü verildi.",
-                        color=0x00ff00,
-                        timestamp=datetime.now(ZoneInfo("UTC"))
-                    )
-                    embed.add_field(name="Habsen Kullanıcı Adı", value=f"**{self.username}**", inline=False)
-                    embed.set_footer(text="Habsen Topluluğu")
-                    await interaction.followup.send(embed=embed, ephemeral=True)
-                except discord.Forbidden:
-                    embed = discord.Embed(
-                        title="İzin Hatası",
-                        description="Rol eklenemedi. Botun izinlerini kontrol edin.",
-                        color=0xffff00,
-                        timestamp=datetime.now(ZoneInfo("UTC"))
-                    )
-                    embed.set_footer(text="Habsen Topluluğu")
-                    await interaction.followup.send(embed=embed, ephemeral=True)
-            del self.verification_codes[self.user_id]
+            if not claim_verification(self.verification_codes, self.user_id, entry):
+                # Kod bu sırada otomatik doğrulamayla kullanıldı ya da süresi doldu
+                embed = discord.Embed(
+                    title="Kod Geçersiz",
+                    description="Hesabın zaten doğrulandı veya bu doğrulama kodu artık geçerli değil.",
+                    color=0xff0000,
+                    timestamp=datetime.now(ZoneInfo("UTC"))
+                )
+                embed.set_footer(text="Habsen Topluluğu")
+                await interaction.followup.send(embed=embed, ephemeral=True)
+                return
+            await interaction.client.timers.cancel("verification", self.user_id, interaction.guild_id)
+            embed = await grant_verified_role(interaction.guild, self.user_id, self.username)
+            if embed:
+                await interaction.followup.send(embed=embed, ephemeral=True)
             self.children[0].disabled = True
             await interaction.message.edit(view=self)
         else:
@@ -89,6 +140,29 @@ class Registration(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.verification_codes = {}
+        if AUTO_VERIFY:
+            self.auto_verify.start()
+
+    async def cog_unload(self):
+        self.auto_verify.cancel()
+
+    async def cog_load(self):
+        await username_cache.open()
+        # Bekleyen kodlar yeniden başlatmadan sonra da geçerlidir; mesajları kaybolduğu için sonuç DM ile bildirilir
+        timers = await self.bot.timers.register("verification", self.expire_timer)
+        now = datetime.now(ZoneInfo("UTC")).timestamp()
+        for timer in timers:
+            self.verification_codes[int(timer.key)] = {
+                "username": timer.payload["username"],
+                "code": timer.payload["code"],
+                "expires_at": timer.due,
+                "guild_id": timer.guild_id,
+                "message": None,
+                "attempts": 0,
+                "next_check": now
+            }
+        if SELENIUM_FALLBACK:
+            await browser_pool.warm()
 
     @app_commands.command(name="kayıt", description="Habsen kullanıcı adınızı doğrulayın")
     @app_commands.describe(username="Habsen kullanıcı adınız")
@@ -106,7 +180,11 @@ class Registration(commands.Cog):
             return
 
         await interaction.response.defer(ephemeral=True)
-        is_valid = await check_username_validity(username)
+        try:
+            is_valid = await check_username_validity(username)
+        except UpstreamUnavailable:
+            await interaction.followup.send(embed=unavailable_embed(), ephemeral=True)
+            return
         if not is_valid:
             embed = discord.Embed(
                 title="Geçersiz Kullanıcı Adı",
@@ -132,11 +210,16 @@ class Registration(commands.Cog):
             return
 
         code = f"KOD-{''.join(random.choices(string.ascii_uppercase + string.digits, k=6))}"
+        # Geçici mesaj etkileşim jetonuyla düzenlenir ve jeton etkileşimden 15 dakika sonra geçersizleşir;
+        # süre dolumu mesajının gösterilebilmesi için kod jetondan biraz önce sona erer
+        expires_at = int(interaction.created_at.timestamp()) + 15 * 60 - VERIFICATION_EXPIRY_MARGIN
         self.verification_codes[interaction.user.id] = {
             "username": username,
             "code": code,
-            "expires_at": datetime.now(ZoneInfo("UTC")).timestamp() + 15 * 60
+            "expires_at": expires_at
         }
+        await self.bot.timers.schedule("verification", interaction.user.id, interaction.guild_id, expires_at,
+                                       {"username": username, "code": code})
 
         embed = discord.Embed(
             title="Doğrulama Kodu",
@@ -146,14 +229,89 @@ class Registration(commands.Cog):
                 f"2. Motto kısmına sadece **{code}** yazın.\n"
                 f"3. Profilinizi kaydedin.\n"
                 f"4. Ardından aşağıdaki **Kontrol Et** butonuna basın.\n"
-                f"*Bu kod 15 dakika geçerlidir.*"
+                f"*Bu kod <t:{expires_at}:t> saatine kadar geçerlidir.*"
             ),
             color=0x800080,
             timestamp=datetime.now(ZoneInfo("UTC"))
         )
+        if AUTO_VERIFY:
+            embed.add_field(name="Otomatik Kontrol",
+                            value="Kod profilinizde görüldüğünde rolünüz otomatik olarak verilir ve bu mesaj güncellenir.",
+                            inline=False)
         embed.set_footer(text="Habsen Topluluğu")
         view = VerifyButton(interaction.user.id, username, code, self.verification_codes)
-        await interaction.followup.send(embed=embed, view=view, ephemeral=True)
+        message = await interaction.followup.send(embed=embed, view=view, ephemeral=True, wait=True)
+        entry = self.verification_codes.get(interaction.user.id)
+        if entry and entry["code"] == code:
+            entry.update(guild_id=interaction.guild_id, message=message, attempts=0,
+                         next_check=datetime.now(ZoneInfo("UTC")).timestamp() + AUTO_VERIFY_BACKOFF)
+
+    @tasks.loop(seconds=AUTO_VERIFY_INTERVAL)
+    async def auto_verify(self):
+        # Bekleyen doğrulamalar sırayla ve sınırlı sayıda denetlenir; başarısız denemeler üstel olarak seyrekleşir
+        now = datetime.now(ZoneInfo("UTC")).timestamp()
+        due = []
+        for user_id, entry in list(self.verification_codes.items()):
+            # Süresi dolanlar zamanlayıcı tarafından kapatılır
+            if "next_check" in entry and entry["next_check"] <= now < entry["expires_at"]:
+                due.append((user_id, entry))
+        due.sort(key=lambda item: item[1]["next_check"])
+        batch = due[:AUTO_VERIFY_BATCH]
+        if not batch:
+            return
+
+        results = await asyncio.gather(*(check_motto(entry["username"], entry["code"]) for _, entry in batch),
+                                       return_exceptions=True)
+        for (user_id, entry), verified in zip(batch, results):
+            if isinstance(verified, Exception) and not isinstance(verified, UpstreamUnavailable):
+                logger.error(f"Otomatik doğrulama hatası (user_id: {user_id}): {str(verified)}")
+            if verified is True:
+                await self.finish_verification(user_id, entry)
+            else:
+                entry["attempts"] += 1
+                entry["next_check"] = now + min(AUTO_VERIFY_BACKOFF * 2 ** entry["attempts"], AUTO_VERIFY_MAX_BACKOFF)
+
+    async def finish_verification(self, user_id, entry):
+        if not claim_verification(self.verification_codes, user_id, entry):
+            return
+        await self.bot.timers.cancel("verification", user_id, entry["guild_id"])
+        guild = self.bot.get_guild(entry["guild_id"])
+        if not guild:
+            return
+        try:
+            embed = await grant_verified_role(guild, user_id, entry["username"])
+            if embed and entry["message"]:
+                await entry["message"].edit(embed=embed, view=None)
+            elif embed:
+                user = self.bot.get_user(user_id)
+                if user:
+                    dm_dispatcher.send(user, embed)
+        except discord.HTTPException as e:
+            logger.error(f"Otomatik doğrulama mesajı güncellenemedi (user_id: {user_id}): {str(e)}")
+
+    async def expire_timer(self, timer):
+        entry = self.verification_codes.get(int(timer.key))
+        if entry and entry["code"] == timer.payload["code"]:
+            await self.expire_verification(int(timer.key), entry)
+
+    async def expire_verification(self, user_id, entry):
+        if not claim_verification(self.verification_codes, user_id, entry) or not entry.get("message"):
+            return
+        embed = discord.Embed(
+            title="Süre Doldu",
+            description="Doğrulama kodunun süresi doldu. Lütfen tekrar /kayıt komutunu kullanın.",
+            color=0xff0000,
+            timestamp=datetime.now(ZoneInfo("UTC"))
+        )
+        embed.set_footer(text="Habsen Topluluğu")
+        try:
+            await entry["message"].edit(embed=embed, view=None)
+        except discord.HTTPException as e:
+            logger.error(f"Doğrulama süresi dolumu mesajı güncellenemedi (user_id: {user_id}): {str(e)}")
+
+    @auto_verify.before_loop
+    async def before_auto_verify(self):
+        await self.bot.wait_until_ready()
 
 async def setup(bot):
     await bot.add_cog(Registration(bot))
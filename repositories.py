@@ -0,0 +1,365 @@
+import asyncio
+from database import epoch
+
+class Record:
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row) if row else None
+
+    @classmethod
+    def from_rows(cls, rows):
+        return [cls(*row) for row in rows]
+
+class WarningRecord(Record):
+    __slots__ = ("id", "violation_type", "reason", "timestamp")
+
+class JailRecord(Record):
+    __slots__ = ("id", "user_id", "guild_id", "end_time")
+
+class BadgeRecord(Record):
+    __slots__ = ("id", "user_id", "guild_id", "badge_url", "status", "message_id")
+
+class BadgeSummary(Record):
+    __slots__ = ("id", "status", "submitted_at", "reason")
+
+def placeholders(values):
+    return ", ".join("?" for _ in values)
+
+ARCHIVE_CHUNK_SIZE = 500
+
+WARNING_COLUMNS = "id, user_id, guild_id, violation_type, reason, moderator_id, timestamp, expires_at"
+JAIL_COLUMNS = "id, user_id, guild_id, moderator_id, start_time, end_time, original_roles"
+# Geçmiş tablosu rolleri JSON olarak saklar; jail_roles satırları ON DELETE CASCADE ile silinir
+JAIL_SOURCE_COLUMNS = ("id, user_id, guild_id, moderator_id, start_time, end_time, "
+                       "(SELECT json_group_array(role_id) FROM jail_roles WHERE jail_roles.jail_id = jails.id)")
+BADGE_COLUMNS = "id, user_id, guild_id, badge_url, status, moderator_id, submitted_at, reviewed_at, reason, message_id"
+
+async def move_to_history(db, table, columns, ids, archived_at, source_columns=None):
+    # Aynı id geçmişte zaten varsa iş IntegrityError ile geri alınır; arşivlenmiş kayıt ezilmez
+    marks = placeholders(ids)
+    await db.execute(f'''
+        INSERT INTO {table}_history ({columns}, archived_at)
+        SELECT {source_columns or columns}, ? FROM {table} WHERE id IN ({marks})
+    ''', (archived_at, *ids))
+    cursor = await db.execute(f'DELETE FROM {table} WHERE id IN ({marks})', tuple(ids))
+    return cursor.rowcount
+
+async def archive_where(db, table, columns, condition, params, limit, archived_at, source_columns=None):
+    cursor = await db.execute(f'SELECT id FROM {table} WHERE {condition} LIMIT ?', (*params, limit))
+    ids = [row[0] for row in await cursor.fetchall()]
+    if not ids:
+        return 0
+    return await move_to_history(db, table, columns, ids, archived_at, source_columns)
+
+async def archive_in_chunks(storage, archive, chunk_size=ARCHIVE_CHUNK_SIZE):
+    # Her parça ayrı bir yazma işidir; büyük birikimler yazıcıyı uzun süre kilitlemez.
+    # Parçalı depolamada her sunucu dosyası sırayla arşivlenir
+    total = 0
+    async for db in storage.shards():
+        while True:
+            moved = await db.write(lambda connection: archive(connection, chunk_size))
+            total += moved
+            if moved < chunk_size:
+                break
+            await asyncio.sleep(0)
+    return total
+
+# Sorgu metinleri sabit tutulur; sqlite3 hazırlanmış ifadeleri bağlantı başına metne göre önbelleğe alır
+INSERT_WARNING = '''
+    INSERT INTO warnings (user_id, guild_id, violation_type, reason, moderator_id, timestamp, expires_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+COUNT_ACTIVE_WARNINGS = '''
+    SELECT COUNT(*) FROM warnings
+    WHERE user_id = ? AND guild_id = ? AND expires_at > ?
+'''
+COUNT_ACTIVE_WARNINGS_BY_TYPE = '''
+    SELECT COUNT(*) FROM warnings
+    WHERE user_id = ? AND guild_id = ? AND violation_type = ? AND expires_at > ?
+'''
+COUNT_ACTIVE_WARNINGS_COMBINED = '''
+    SELECT COUNT(*), COALESCE(SUM(violation_type = ?), 0) FROM warnings
+    WHERE user_id = ? AND guild_id = ? AND expires_at > ?
+'''
+SELECT_ACTIVE_WARNINGS = '''
+    SELECT id, violation_type, reason, timestamp FROM warnings
+    WHERE user_id = ? AND guild_id = ? AND expires_at > ?
+'''
+SELECT_WARNING_HISTORY = '''
+    SELECT id, violation_type, reason, timestamp FROM warnings_history
+    WHERE user_id = ? AND guild_id = ?
+    ORDER BY timestamp DESC
+    LIMIT ?
+'''
+SELECT_ALL_ACTIVE_WARNINGS = '''
+    SELECT id, user_id, guild_id, violation_type, expires_at FROM warnings
+    WHERE expires_at > ?
+'''
+COUNT_ACTIVE_WARNINGS_GROUPED = '''
+    SELECT guild_id, user_id, violation_type, COUNT(*) FROM warnings
+    WHERE expires_at > ?
+    GROUP BY guild_id, user_id, violation_type
+'''
+DELETE_WARNING = 'DELETE FROM warnings WHERE id = ? RETURNING guild_id, user_id, violation_type'
+
+class WarningRepo:
+    def __init__(self, db, counters=None):
+        self.db = db
+        self.counters = counters
+
+    async def add_and_count(self, user_id, guild_id, violation_type, reason, moderator_id, timestamp, expires_at):
+        # Ekleme ve iki sayım aynı iş içinde: (uyarı id, bu türdeki aktif uyarı, toplam aktif uyarı)
+        async def job(db):
+            cursor = await db.execute(INSERT_WARNING, (user_id, guild_id, violation_type, reason,
+                                                       moderator_id, timestamp, expires_at))
+            warning_id = cursor.lastrowid
+            cursor = await db.execute(COUNT_ACTIVE_WARNINGS_COMBINED, (violation_type, user_id, guild_id, timestamp))
+            total, by_type = await cursor.fetchone()
+            return warning_id, by_type, total
+        db = await self.db.for_guild(guild_id)
+        warning_id, by_type, total = await db.write(job)
+        if self.counters is not None:
+            self.counters.add(guild_id, user_id, violation_type, warning_id, expires_at)
+        return warning_id, by_type, total
+
+    async def count_active(self, user_id, guild_id, now, violation_type=None):
+        if self.counters is not None and self.counters.ready:
+            return self.counters.count(guild_id, user_id, now, violation_type)
+        db = await self.db.for_guild(guild_id)
+        if violation_type is None:
+            row = await db.fetchone(COUNT_ACTIVE_WARNINGS, (user_id, guild_id, now))
+        else:
+            row = await db.fetchone(COUNT_ACTIVE_WARNINGS_BY_TYPE, (user_id, guild_id, violation_type, now))
+        return row[0]
+
+    async def list_active(self, user_id, guild_id, now):
+        db = await self.db.for_guild(guild_id)
+        rows = await db.fetchall(SELECT_ACTIVE_WARNINGS, (user_id, guild_id, now))
+        return WarningRecord.from_rows(rows)
+
+    async def delete(self, guild_id, warning_id):
+        async def job(db):
+            cursor = await db.execute(DELETE_WARNING, (warning_id,))
+            return await cursor.fetchall()
+        db = await self.db.for_guild(guild_id)
+        rows = await db.write(job)
+        if rows and self.counters is not None:
+            self.counters.remove(*rows[0], warning_id)
+        return bool(rows)
+
+    async def warm_counters(self, now):
+        rows = []
+        async for db in self.db.shards():
+            rows.extend(await db.fetchall(SELECT_ALL_ACTIVE_WARNINGS, (now,)))
+        self.counters.load(rows)
+        return len(rows)
+
+    async def check_counters(self, now, repair=False):
+        # Önbelleği veritabanındaki gerçek sayılarla karşılaştırır: [(anahtar, önbellek, veritabanı)]
+        actual = {}
+        async for db in self.db.shards():
+            for guild_id, user_id, violation_type, count in await db.fetchall(COUNT_ACTIVE_WARNINGS_GROUPED, (now,)):
+                actual[(guild_id, user_id, violation_type)] = count
+        cached = self.counters.snapshot(now)
+        mismatches = [(key, cached.get(key, 0), actual.get(key, 0))
+                      for key in sorted(cached.keys() | actual.keys(), key=str)
+                      if cached.get(key, 0) != actual.get(key, 0)]
+        if mismatches and repair:
+            await self.warm_counters(now)
+        return mismatches
+
+    async def list_history(self, user_id, guild_id, limit=50):
+        db = await self.db.for_guild(guild_id)
+        rows = await db.fetchall(SELECT_WARNING_HISTORY, (user_id, guild_id, limit))
+        return WarningRecord.from_rows(rows)
+
+    async def archive_expired(self, before):
+        async def archive(db, limit):
+            return await archive_where(db, "warnings", WARNING_COLUMNS, 'expires_at <= ?', (before,), limit, epoch())
+        return await archive_in_chunks(self.db, archive)
+
+INSERT_JAIL = '''
+    INSERT INTO jails (user_id, guild_id, moderator_id, start_time, end_time)
+    VALUES (?, ?, ?, ?, ?)
+'''
+INSERT_JAIL_ROLE = 'INSERT OR IGNORE INTO jail_roles (jail_id, role_id) VALUES (?, ?)'
+SELECT_ACTIVE_JAIL = '''
+    SELECT id, user_id, guild_id, end_time FROM jails
+    WHERE user_id = ? AND guild_id = ? AND end_time > ?
+'''
+SELECT_PENDING_JAILS = 'SELECT id, user_id, guild_id, end_time FROM jails'
+REINSTATE_JAIL = '''
+    INSERT INTO jails (id, user_id, guild_id, moderator_id, start_time, end_time)
+    SELECT id, user_id, guild_id, moderator_id, start_time, ? FROM jails_history WHERE id = ?
+'''
+REINSTATE_JAIL_ROLES = '''
+    INSERT OR IGNORE INTO jail_roles (jail_id, role_id)
+    SELECT jails_history.id, roles.value FROM jails_history, json_each(jails_history.original_roles) AS roles
+    WHERE jails_history.id = ? AND json_valid(jails_history.original_roles)
+'''
+
+class JailRepo:
+    def __init__(self, db, scheduler=None):
+        self.db = db
+        self.scheduler = scheduler
+
+    async def add(self, user_id, guild_id, moderator_id, start_time, end_time, original_roles):
+        async def job(db):
+            cursor = await db.execute(INSERT_JAIL, (user_id, guild_id, moderator_id, start_time, end_time))
+            jail_id = cursor.lastrowid
+            await db.executemany(INSERT_JAIL_ROLE, [(jail_id, role_id) for role_id in original_roles])
+            return jail_id
+        db = await self.db.for_guild(guild_id)
+        jail_id = await db.write(job)
+        if self.scheduler is not None:
+            self.scheduler.schedule(end_time, JailRecord(jail_id, user_id, guild_id, end_time))
+        return jail_id
+
+    async def active(self, user_id, guild_id, now):
+        db = await self.db.for_guild(guild_id)
+        row = await db.fetchone(SELECT_ACTIVE_JAIL, (user_id, guild_id, now))
+        return JailRecord.from_row(row)
+
+    async def pending(self):
+        # Serbest bırakılan jail'ler geçmiş tablosuna taşındığı için jails tablosundaki her kayıt bekliyordur
+        jails = []
+        async for db in self.db.shards():
+            jails.extend(JailRecord.from_rows(await db.fetchall(SELECT_PENDING_JAILS)))
+        return jails
+
+    async def schedule_pending(self):
+        jails = await self.pending()
+        for jail in jails:
+            self.scheduler.schedule(jail.end_time, jail)
+        return len(jails)
+
+    async def roles_for(self, guild_id, jail_ids):
+        # Bir grup jail için geri yüklenecek tüm roller tek sorguda
+        roles = {jail_id: [] for jail_id in jail_ids}
+        if not jail_ids:
+            return roles
+        db = await self.db.for_guild(guild_id)
+        rows = await db.fetchall(
+            f'SELECT jail_id, role_id FROM jail_roles WHERE jail_id IN ({placeholders(jail_ids)})',
+            tuple(jail_ids)
+        )
+        for jail_id, role_id in rows:
+            roles[jail_id].append(role_id)
+        return roles
+
+    async def release(self, guild_id, jail_id):
+        # Kaydı silen tek yazma işi sahipliği belirler: /unjail ile zamanlayıcıdan yalnızca biri True alır
+        return await self.release_many(guild_id, [jail_id]) > 0
+
+    async def release_many(self, guild_id, jail_ids):
+        if not jail_ids:
+            return 0
+        async def job(db):
+            return await move_to_history(db, "jails", JAIL_COLUMNS, jail_ids, epoch(), JAIL_SOURCE_COLUMNS)
+        db = await self.db.for_guild(guild_id)
+        return await db.write(job)
+
+    async def reinstate(self, jail, end_time):
+        # Serbest bırakma Discord tarafında başarısız olduğunda kayıt ve rolleri geçmişten geri alınır
+        async def job(db):
+            cursor = await db.execute(REINSTATE_JAIL, (end_time, jail.id))
+            if cursor.rowcount == 0:
+                return False
+            await db.execute(REINSTATE_JAIL_ROLES, (jail.id,))
+            await db.execute('DELETE FROM jails_history WHERE id = ?', (jail.id,))
+            return True
+        db = await self.db.for_guild(jail.guild_id)
+        reinstated = await db.write(job)
+        if reinstated and self.scheduler is not None:
+            self.scheduler.schedule(end_time, JailRecord(jail.id, jail.user_id, jail.guild_id, end_time))
+        return reinstated
+
+COUNT_RECENT_BADGES = '''
+    SELECT COUNT(*) FROM badges
+    WHERE user_id = ? AND guild_id = ? AND submitted_at > ?
+'''
+SELECT_USER_BADGES = '''
+    SELECT id, status, submitted_at, reason FROM badges
+    WHERE user_id = ? AND guild_id = ?
+    ORDER BY submitted_at DESC
+'''
+SELECT_USER_PENDING_BADGES = '''
+    SELECT id, status, submitted_at, reason FROM badges
+    WHERE user_id = ? AND guild_id = ? AND status = 'pending'
+    ORDER BY submitted_at DESC
+'''
+SELECT_BADGE = 'SELECT id, user_id, guild_id, badge_url, status, message_id FROM badges WHERE id = ?'
+INSERT_BADGE = '''
+    INSERT INTO badges (user_id, guild_id, badge_url, status, submitted_at)
+    VALUES (?, ?, ?, 'pending', ?)
+'''
+UPDATE_BADGE_MESSAGE = 'UPDATE badges SET message_id = ? WHERE id = ?'
+REVIEW_BADGE = '''
+    UPDATE badges
+    SET status = ?, moderator_id = ?, reviewed_at = ?, reason = ?
+    WHERE id = ? AND status = 'pending'
+'''
+DELETE_BADGE = 'DELETE FROM badges WHERE id = ? RETURNING message_id'
+
+class BadgeRepo:
+    def __init__(self, db):
+        self.db = db
+
+    async def count_recent(self, user_id, guild_id, since):
+        db = await self.db.for_guild(guild_id)
+        row = await db.fetchone(COUNT_RECENT_BADGES, (user_id, guild_id, since))
+        return row[0]
+
+    async def list_for_user(self, user_id, guild_id):
+        db = await self.db.for_guild(guild_id)
+        rows = await db.fetchall(SELECT_USER_BADGES, (user_id, guild_id))
+        return BadgeSummary.from_rows(rows)
+
+    async def pending_for_user(self, user_id, guild_id):
+        db = await self.db.for_guild(guild_id)
+        rows = await db.fetchall(SELECT_USER_PENDING_BADGES, (user_id, guild_id))
+        return BadgeSummary.from_rows(rows)
+
+    async def get(self, guild_id, badge_id):
+        db = await self.db.for_guild(guild_id)
+        row = await db.fetchone(SELECT_BADGE, (badge_id,))
+        return BadgeRecord.from_row(row)
+
+    async def add(self, user_id, guild_id, badge_url, submitted_at):
+        db = await self.db.for_guild(guild_id)
+        result = await db.execute(INSERT_BADGE, (user_id, guild_id, badge_url, submitted_at))
+        return result.lastrowid
+
+    async def set_message(self, guild_id, badge_id, message_id):
+        db = await self.db.for_guild(guild_id)
+        await db.execute(UPDATE_BADGE_MESSAGE, (message_id, badge_id))
+
+    async def review(self, guild_id, badge_id, status, moderator_id, reviewed_at, reason=None):
+        # Yalnızca hâlâ beklemede olan talep güncellenir; iki moderatör aynı anda karar veremez
+        db = await self.db.for_guild(guild_id)
+        result = await db.execute(REVIEW_BADGE, (status, moderator_id, reviewed_at, reason, badge_id))
+        return result.rowcount > 0
+
+    async def archive_reviewed(self, before):
+        async def archive(db, limit):
+            return await archive_where(db, "badges", BADGE_COLUMNS, "status != 'pending' AND reviewed_at <= ?",
+                                       (before,), limit, epoch())
+        return await archive_in_chunks(self.db, archive)
+
+    async def delete(self, guild_id, badge_id):
+        async def job(db):
+            cursor = await db.execute(DELETE_BADGE, (badge_id,))
+            rows = await cursor.fetchall()
+            return rows[0][0] if rows else None
+        db = await self.db.for_guild(guild_id)
+        return await db.write(job)
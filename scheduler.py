@@ -0,0 +1,67 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+logger = logging.getLogger("HabsenBot")
+
+class DeadlineScheduler:
+    # Bitiş zamanları (epoch saniyesi) bir min-yığında tutulur; görev en yakın bitişe kadar uyur ve
+    # zamanı gelen tüm öğeleri tek seferde callback'e verir. Yeni ve daha erken bir bitiş uykuyu böler
+    def __init__(self, callback, name="zamanlayıcı"):
+        self.callback = callback
+        self.name = name
+        self._heap = []
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.fired = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, deadline, item):
+        earliest = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (deadline, next(self._sequence), item))
+        if earliest is None or deadline < earliest:
+            self._wakeup.set()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _pop_due(self, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[2])
+        return due
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            due = self._pop_due(time.time())
+            self.fired += len(due)
+            try:
+                await self.callback(due)
+            except Exception as e:
+                logger.error(f"{self.name} işlenirken hata: {str(e)}")
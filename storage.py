@@ -0,0 +1,149 @@
+import asyncio
+from collections import OrderedDict
+import aiosqlite
+import logging
+import os
+import sys
+import tempfile
+from database import Database
+
+logger = logging.getLogger("HabsenBot")
+
+# Sunucuya ait satırları taşıyan tablolar; jail_roles, jails üzerinden bölünür
+SHARDED_TABLES = ("warnings", "jails", "badges", "warnings_history", "jails_history", "badges_history", "timers")
+SEQUENCE_TABLES = ("warnings", "jails", "badges")
+
+def shard_path(directory, guild_id):
+    return os.path.join(directory, f"{guild_id}.db")
+
+class StorageRouter:
+    # Her sunucu için ayrı bir SQLite dosyası; bir topluluğun yazma yükü diğerlerini bekletmez.
+    # Depolar Database ile aynı for_guild/shards arayüzünü kullanır
+    def __init__(self, directory, max_open=32, readers=1):
+        self.directory = directory
+        self.max_open = max_open
+        self.readers = readers
+        self._open = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    async def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+
+    async def close(self):
+        async with self._lock:
+            while self._open:
+                _, db = self._open.popitem(last=False)
+                await db.close()
+
+    async def for_guild(self, guild_id):
+        db = self._open.get(guild_id)
+        if db is not None:
+            self._open.move_to_end(guild_id)
+            return db
+        async with self._lock:
+            db = self._open.get(guild_id)
+            if db is None:
+                db = Database(shard_path(self.directory, guild_id), readers=self.readers)
+                await db.open()
+                self._open[guild_id] = db
+                await self._evict(keep=guild_id)
+            self._open.move_to_end(guild_id)
+            return db
+
+    async def _evict(self, keep):
+        # En uzun süredir kullanılmayan ve o an işi olmayan dosyalar kapatılır; yeni açılan dosya
+        # çağırana döneceği için atlanır, meşgul dosyalar bir sonraki açılışta yeniden denenir
+        for guild_id in list(self._open):
+            if len(self._open) <= self.max_open:
+                return
+            db = self._open[guild_id]
+            if guild_id != keep and db.idle:
+                del self._open[guild_id]
+                await db.close()
+
+    def guild_ids(self):
+        guild_ids = []
+        for name in os.listdir(self.directory):
+            stem, extension = os.path.splitext(name)
+            if extension == ".db" and stem.isdigit():
+                guild_ids.append(int(stem))
+        return sorted(guild_ids)
+
+    async def shards(self):
+        # Dosyalar sırayla açılır; tüm sunucular aynı anda açık tutulmaz. Döngü gövdesi sürerken
+        # dosya tutulur, aradaki beklemelerde başka bir sunucunun açılışı onu kapatamaz
+        for guild_id in self.guild_ids():
+            db = await self.for_guild(guild_id)
+            async with db.hold():
+                yield db
+
+async def split_database(source_path, directory):
+    # Mevcut tek dosyalı veritabanını sunucu başına dosyalara böler. Kaynak dosya değiştirilmez:
+    # şema yükseltmesi ve okuma geçici bir kopya üzerinde yapılır
+    if not os.path.exists(source_path):
+        raise FileNotFoundError(source_path)
+    with tempfile.TemporaryDirectory() as workdir:
+        copy_path = os.path.join(workdir, os.path.basename(source_path))
+        async with aiosqlite.connect(source_path) as db:
+            await db.execute('VACUUM INTO ?', (copy_path,))
+        return await _split_copy(copy_path, directory)
+
+async def _split_copy(copy_path, directory):
+    source = Database(copy_path, readers=0)
+    await source.open()
+    await source.close()
+    os.makedirs(directory, exist_ok=True)
+    async with aiosqlite.connect(copy_path) as db:
+        query = " UNION ".join(f"SELECT guild_id FROM {table}" for table in SHARDED_TABLES)
+        cursor = await db.execute(query)
+        guild_ids = [row[0] for row in await cursor.fetchall() if row[0] is not None]
+
+    for guild_id in guild_ids:
+        path = shard_path(directory, guild_id)
+        if os.path.exists(path):
+            logger.warning(f"{path} zaten var, atlandı")
+            continue
+        shard = Database(path, readers=0)
+        await shard.open()
+        await shard.close()
+        connection = await shard.connect()
+        try:
+            await connection.execute('ATTACH DATABASE ? AS source', (copy_path,))
+            await connection.execute('BEGIN IMMEDIATE')
+            for table in SHARDED_TABLES:
+                await connection.execute(
+                    f'INSERT INTO main.{table} SELECT * FROM source.{table} WHERE guild_id = ?', (guild_id,)
+                )
+            await connection.execute('''
+                INSERT INTO main.jail_roles (jail_id, role_id)
+                SELECT jail_roles.jail_id, jail_roles.role_id
+                FROM source.jail_roles JOIN source.jails ON jails.id = jail_roles.jail_id
+                WHERE jails.guild_id = ?
+            ''', (guild_id,))
+            # sqlite_sequence yalnızca canlı tablolardaki en büyük id'yi görür; yeni kayıtlar geçmişteki
+            # id'leri yeniden kullanmasın diye sayaç geçmiş tablolarıyla birlikte hesaplanır
+            for table in SEQUENCE_TABLES:
+                await connection.execute('DELETE FROM main.sqlite_sequence WHERE name = ?', (table,))
+                await connection.execute(f'''
+                    INSERT INTO main.sqlite_sequence (name, seq)
+                    SELECT ?, MAX(id) FROM (SELECT id FROM main.{table} UNION ALL SELECT id FROM main.{table}_history)
+                    HAVING MAX(id) IS NOT NULL
+                ''', (table,))
+            await connection.execute('COMMIT')
+            await connection.execute('DETACH DATABASE source')
+        except BaseException:
+            await connection.close()
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            raise
+        await connection.close()
+        logger.info(f"{guild_id} sunucusu {path} dosyasına taşındı")
+    return guild_ids
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) != 3:
+        print("Kullanım: python storage.py <warnings.db> <hedef klasör>")
+        sys.exit(1)
+    asyncio.run(split_database(sys.argv[1], sys.argv[2]))
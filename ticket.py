@@ -1,15 +1,18 @@
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
-import aiosqlite
+from database import epoch
+from repositories import BadgeRepo
+from publisher import dm_dispatcher
 import os
 
 class BadgeRequestView(discord.ui.View):
-    def __init__(self, pending_badge_requests):
+    def __init__(self, pending_badge_requests, badge_repo):
         super().__init__(timeout=None)
         self.pending_badge_requests = pending_badge_requests
+        self.badge_repo = badge_repo
 
     @discord.ui.button(label="Rozet Talebi Oluştur", style=discord.ButtonStyle.primary, custom_id="badge_create_button")
     async def create_badge(self, interaction: discord.Interaction):
@@ -25,7 +28,8 @@ class BadgeRequestView(discord.ui.View):
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
 
-        self.pending_badge_requests[interaction.user.id] = datetime.now(ZoneInfo("UTC")).timestamp() + 5 * 60
+        expires_at = epoch() + 5 * 60
+        self.pending_badge_requests[interaction.user.id] = expires_at
 
         embed = discord.Embed(
             title="Rozet Talebi Oluşturma",
@@ -40,17 +44,12 @@ class BadgeRequestView(discord.ui.View):
         )
         embed.set_footer(text="Habsen Topluluğu")
         await interaction.response.send_message(embed=embed, ephemeral=True)
+        await interaction.client.timers.schedule("badge_window", interaction.user.id, interaction.guild_id, expires_at)
 
     @discord.ui.button(label="Rozet Durum", style=discord.ButtonStyle.secondary, custom_id="badge_status_button")
     async def badge_status(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
-        async with aiosqlite.connect("warnings.db") as db:
-            cursor = await db.execute('''
-                SELECT id, status, submitted_at, reason FROM badges 
-                WHERE user_id = ? AND guild_id = ?
-                ORDER BY submitted_at DESC
-            ''', (interaction.user.id, interaction.guild_id))
-            badges = await cursor.fetchall()
+        badges = await self.badge_repo.list_for_user(interaction.user.id, interaction.guild_id)
 
         if not badges:
             embed = discord.Embed(
@@ -70,11 +69,11 @@ class BadgeRequestView(discord.ui.View):
             timestamp=datetime.now(ZoneInfo("UTC"))
         )
         for badge in badges:
-            status = {"pending": "Beklemede ⏳", "approved": "Onaylandı ✅", "rejected": "Reddedildi ❌"}[badge[1]]
-            submitted_at = datetime.fromisoformat(badge[2]).strftime('%Y-%m-%d %H:%M')
-            reason = f"\n**Sebep**: {badge[3]}" if badge[3] and badge[1] == "rejected" else ""
+            status = {"pending": "Beklemede ⏳", "approved": "Onaylandı ✅", "rejected": "Reddedildi ❌"}[badge.status]
+            submitted_at = datetime.fromtimestamp(badge.submitted_at, ZoneInfo("UTC")).strftime('%Y-%m-%d %H:%M')
+            reason = f"\n**Sebep**: {badge.reason}" if badge.reason and badge.status == "rejected" else ""
             embed.add_field(
-                name=f"Talep ID: {badge[0]}",
+                name=f"Talep ID: {badge.id}",
                 value=f"**Durum**: {status}\n**Gönderilme**: {submitted_at}{reason}",
                 inline=False
             )
@@ -84,13 +83,7 @@ class BadgeRequestView(discord.ui.View):
     @discord.ui.button(label="Rozet İptal", style=discord.ButtonStyle.red, custom_id="badge_cancel_button")
     async def badge_cancel(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
-        async with aiosqlite.connect("warnings.db") as db:
-            cursor = await db.execute('''
-                SELECT id, submitted_at FROM badges 
-                WHERE user_id = ? AND guild_id = ? AND status = 'pending'
-                ORDER BY submitted_at DESC
-            ''', (interaction.user.id, interaction.guild_id))
-            badges = await cursor.fetchall()
+        badges = await self.badge_repo.pending_for_user(interaction.user.id, interaction.guild_id)
 
         if not badges:
             embed = discord.Embed(
@@ -104,15 +97,16 @@ class BadgeRequestView(discord.ui.View):
             return
 
         class CancelSelect(discord.ui.View):
-            def __init__(self, badges, user):
+            def __init__(self, badges, user, badge_repo):
                 super().__init__(timeout=60)
                 self.user = user
+                self.badge_repo = badge_repo
                 self.add_item(discord.ui.Select(
                     placeholder="İptal Edilecek Talebi Seçin",
                     options=[
                         discord.SelectOption(
-                            label=f"ID: {badge[0]} - Gönderilme: {datetime.fromisoformat(badge[1]).strftime('%Y-%m-%d %H:%M')}",
-                            value=str(badge[0])
+                            label=f"ID: {badge.id} - Gönderilme: {datetime.fromtimestamp(badge.submitted_at, ZoneInfo('UTC')).strftime('%Y-%m-%d %H:%M')}",
+                            value=str(badge.id)
                         ) for badge in badges
                     ],
                     custom_id="cancel_badge_select"
@@ -124,11 +118,7 @@ class BadgeRequestView(discord.ui.View):
             @discord.ui.button(label="İptal Et", style=discord.ButtonStyle.red)
             async def confirm_cancel(self, interaction: discord.Interaction, button: discord.ui.Button):
                 badge_id = int(self.children[0].values[0])
-                async with aiosqlite.connect("warnings.db") as db:
-                    cursor = await db.execute('SELECT message_id FROM badges WHERE id = ?', (badge_id,))
-                    message_id = (await cursor.fetchone())[0]
-                    await db.execute('DELETE FROM badges WHERE id = ?', (badge_id,))
-                    await db.commit()
+                message_id = await self.badge_repo.delete(interaction.guild_id, badge_id)
 
                 if message_id:
                     log_channel = interaction.guild.get_channel(int(os.getenv("BADGE_MOD_LOG_CHANNEL_ID")))
@@ -148,7 +138,7 @@ class BadgeRequestView(discord.ui.View):
                 embed.set_footer(text="Habsen Topluluğu")
                 await interaction.response.edit_message(embed=embed, view=None)
 
-        view = CancelSelect(badges, interaction.user)
+        view = CancelSelect(badges, interaction.user, self.badge_repo)
         embed = discord.Embed(
             title="Rozet Talebi İptal",
             description="İptal etmek istediğiniz talebi seçin.",
@@ -158,25 +148,40 @@ class BadgeRequestView(discord.ui.View):
         embed.set_footer(text="Habsen Topluluğu")
         await interaction.followup.send(embed=embed, view=view, ephemeral=True)
 
-class BadgeApprovalView(discord.ui.View):
-    def __init__(self, badge_id, user):
-        super().__init__(timeout=None)
-        self.badge_id = badge_id
-        self.user = user
-        self.add_item(discord.ui.Button(
-            label="Onayla",
-            style=discord.ButtonStyle.green,
-            custom_id=f"approve_badge_{self.badge_id}",
-            callback=self.approve_badge
-        ))
-        self.add_item(discord.ui.Button(
-            label="Reddet",
-            style=discord.ButtonStyle.red,
-            custom_id=f"reject_badge_{self.badge_id}",
-            callback=self.reject_badge
+async def badge_owner(client, user_id):
+    # Yalnızca karar anında, önbellekte yoksa tek istekle
+    user = client.get_user(user_id)
+    if user is None:
+        try:
+            user = await client.fetch_user(user_id)
+        except discord.NotFound:
+            return None
+    return user
+
+class BadgeReviewButton(discord.ui.DynamicItem[discord.ui.Button], template=r'(?P<action>approve|reject)_badge_(?P<id>[0-9]+)'):
+    # Talep kimliği custom_id içinde taşınır; bot.add_dynamic_items ile bir kez kaydedilir,
+    # açılışta bekleyen talepler için mesaj çekmek ya da düzenlemek gerekmez
+    def __init__(self, action, badge_id):
+        super().__init__(discord.ui.Button(
+            label="Onayla" if action == "approve" else "Reddet",
+            style=discord.ButtonStyle.green if action == "approve" else discord.ButtonStyle.red,
+            custom_id=f"{action}_badge_{badge_id}"
         ))
+        self.action = action
+        self.badge_id = badge_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["action"], int(match["id"]))
+
+    async def callback(self, interaction: discord.Interaction):
+        badge_repo = interaction.client.get_cog("Ticket").badge_repo
+        if self.action == "approve":
+            await self.approve_badge(interaction, badge_repo)
+        else:
+            await self.reject_badge(interaction, badge_repo)
 
-    async def approve_badge(self, interaction: discord.Interaction, button: discord.ui.Button):
+    async def approve_badge(self, interaction: discord.Interaction, badge_repo):
         moderator_role = interaction.guild.get_role(int(os.getenv("MODERATOR_ROLE_ID")))
         if not moderator_role or moderator_role not in interaction.user.roles:
             embed = discord.Embed(
@@ -189,82 +194,73 @@ class BadgeApprovalView(discord.ui.View):
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
 
-        async with aiosqlite.connect("warnings.db") as db:
-            cursor = await db.execute('SELECT * FROM badges WHERE id = ?', (self.badge_id,))
-            badge = await cursor.fetchone()
-            if not badge or badge[4] != 'pending':
-                embed = discord.Embed(
-                    title="Hata",
-                    description="Bu rozet talebi zaten işlenmiş veya bulunamadı.",
-                    color=0xff0000,
-                    timestamp=datetime.now(ZoneInfo("UTC"))
-                )
-                embed.set_footer(text="Habsen Topluluğu")
-                await interaction.response.send_message(embed=embed, ephemeral=True)
-                return
-
-            await db.execute('''
-                UPDATE badges 
-                SET status = ?, moderator_id = ?, reviewed_at = ?
-                WHERE id = ?
-            ''', ('approved', interaction.user.id, datetime.now(ZoneInfo("UTC")).isoformat(), self.badge_id))
-            await db.commit()
-
-        try:
+        badge = await badge_repo.get(interaction.guild_id, self.badge_id)
+        if not badge or badge.status != 'pending' or not await badge_repo.review(
+                interaction.guild_id, self.badge_id, 'approved', interaction.user.id, epoch()):
             embed = discord.Embed(
-                title="Rozet Talebiniz Onaylandı",
-                description="Rozet talebiniz moderatörler tarafından onaylandı. Rozetiniz hesabınıza eklendi!",
-                color=0x00ff00,
+                title="Hata",
+                description="Bu rozet talebi zaten işlenmiş veya bulunamadı.",
+                color=0xff0000,
                 timestamp=datetime.now(ZoneInfo("UTC"))
             )
             embed.set_footer(text="Habsen Topluluğu")
-            await self.user.send(embed=embed)
-        except discord.Forbidden:
-            pass
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        embed = discord.Embed(
+            title="Rozet Talebiniz Onaylandı",
+            description="Rozet talebiniz moderatörler tarafından onaylandı. Rozetiniz hesabınıza eklendi!",
+            color=0x00ff00,
+            timestamp=datetime.now(ZoneInfo("UTC"))
+        )
+        embed.set_footer(text="Habsen Topluluğu")
+        user = await badge_owner(interaction.client, badge.user_id)
+        if user:
+            dm_dispatcher.send(user, embed)
 
         log_channel = interaction.guild.get_channel(int(os.getenv("BADGE_MOD_LOG_CHANNEL_ID")))
-        if log_channel and badge[9]:
+        if log_channel and badge.message_id:
             try:
-                original_message = await log_channel.fetch_message(badge[9])
+                original_message = await log_channel.fetch_message(badge.message_id)
                 embed = discord.Embed(
                     title="Rozet Talebi Onaylandı",
-                    description=f"{self.user.mention} kullanıcısının rozet talebi onaylandı.",
+                    description=f"<@{badge.user_id}> kullanıcısının rozet talebi onaylandı.",
                     color=0x00ff00,
                     timestamp=datetime.now(ZoneInfo("UTC"))
                 )
-                embed.add_field(name="Kullanıcı", value=self.user.mention)
+                embed.add_field(name="Kullanıcı", value=f"<@{badge.user_id}>")
                 embed.add_field(name="Moderatör", value=interaction.user.mention)
-                embed.set_image(url=badge[3])
+                embed.set_image(url=badge.badge_url)
                 embed.set_footer(text=f"Talep ID: {self.badge_id} | Habsen Topluluğu")
                 await original_message.reply(embed=embed)
                 await interaction.response.edit_message(embed=embed, view=None)
             except discord.NotFound:
                 embed = discord.Embed(
                     title="Rozet Talebi Onaylandı",
-                    description=f"{self.user.mention} kullanıcısının rozet talebi onaylandı.",
+                    description=f"<@{badge.user_id}> kullanıcısının rozet talebi onaylandı.",
                     color=0x00ff00,
                     timestamp=datetime.now(ZoneInfo("UTC"))
                 )
-                embed.add_field(name="Kullanıcı", value=self.user.mention)
+                embed.add_field(name="Kullanıcı", value=f"<@{badge.user_id}>")
                 embed.add_field(name="Moderatör", value=interaction.user.mention)
-                embed.set_image(url=badge[3])
+                embed.set_image(url=badge.badge_url)
                 embed.set_footer(text=f"Talep ID: {self.badge_id} | Habsen Topluluğu")
                 await log_channel.send(embed=embed)
                 await interaction.response.edit_message(embed=embed, view=None)
         else:
             embed = discord.Embed(
                 title="Rozet Talebi Onaylandı",
-                description=f"{self.user.mention} kullanıcısının rozet talebi onaylandı.",
+                description=f"<@{badge.user_id}> kullanıcısının rozet talebi onaylandı.",
                 color=0x00ff00,
                 timestamp=datetime.now(ZoneInfo("UTC"))
             )
-            embed.add_field(name="Kullanıcı", value=self.user.mention)
+            embed.add_field(name="Kullanıcı", value=f"<@{badge.user_id}>")
             embed.add_field(name="Moderatör", value=interaction.user.mention)
-            embed.set_image(url=badge[3])
+            embed.set_image(url=badge.badge_url)
             embed.set_footer(text=f"Talep ID: {self.badge_id} | Habsen Topluluğu")
             await interaction.response.edit_message(embed=embed, view=None)
 
-    async def reject_badge(self, interaction: discord.Interaction, button: discord.ui.Button):
+    async def reject_badge(self, interaction: discord.Interaction, badge_repo):
         moderator_role = interaction.guild.get_role(int(os.getenv("MODERATOR_ROLE_ID")))
         if not moderator_role or moderator_role not in interaction.user.roles:
             embed = discord.Embed(
@@ -288,50 +284,40 @@ class BadgeApprovalView(discord.ui.View):
             reason = modal_interaction.data['components'][0]['components'][0]['value']
             await modal_interaction.response.defer(ephemeral=True)
 
-            async with aiosqlite.connect("warnings.db") as db:
-                cursor = await db.execute('SELECT * FROM badges WHERE id = ?', (self.badge_id,))
-                badge = await cursor.fetchone()
-                if not badge or badge[4] != 'pending':
-                    embed = discord.Embed(
-                        title="Hata",
-                        description="Bu rozet talebi zaten işlenmiş veya bulunamadı.",
-                        color=0xff0000,
-                        timestamp=datetime.now(ZoneInfo("UTC"))
-                    )
-                    embed.set_footer(text="Habsen Topluluğu")
-                    await modal_interaction.followup.send(embed=embed, ephemeral=True)
-                    return
-
-                await db.execute('''
-                    UPDATE badges 
-                    SET status = ?, moderator_id = ?, reviewed_at = ?, reason = ?
-                    WHERE id = ?
-                ''', ('rejected', modal_interaction.user.id, datetime.now(ZoneInfo("UTC")).isoformat(), 
-                      reason, self.badge_id))
-                await db.commit()
-
-            try:
+            badge = await badge_repo.get(modal_interaction.guild_id, self.badge_id)
+            if not badge or badge.status != 'pending' or not await badge_repo.review(
+                    modal_interaction.guild_id, self.badge_id, 'rejected', modal_interaction.user.id, epoch(), reason):
                 embed = discord.Embed(
-                    title="Rozet Talebiniz Reddedildi",
-                    description=f"Rozet talebiniz reddedildi.\n**Sebep**: {reason}",
+                    title="Hata",
+                    description="Bu rozet talebi zaten işlenmiş veya bulunamadı.",
                     color=0xff0000,
                     timestamp=datetime.now(ZoneInfo("UTC"))
                 )
                 embed.set_footer(text="Habsen Topluluğu")
-                await self.user.send(embed=embed)
-            except discord.Forbidden:
-                pass
+                await modal_interaction.followup.send(embed=embed, ephemeral=True)
+                return
+
+            embed = discord.Embed(
+                title="Rozet Talebiniz Reddedildi",
+                description=f"Rozet talebiniz reddedildi.\n**Sebep**: {reason}",
+                color=0xff0000,
+                timestamp=datetime.now(ZoneInfo("UTC"))
+            )
+            embed.set_footer(text="Habsen Topluluğu")
+            user = await badge_owner(modal_interaction.client, badge.user_id)
+            if user:
+                dm_dispatcher.send(user, embed)
 
             embed = discord.Embed(
                 title="Rozet Talebi Reddedildi",
-                description=f"{self.user.mention} kullanıcısının rozet talebi reddedildi.",
+                description=f"<@{badge.user_id}> kullanıcısının rozet talebi reddedildi.",
                 color=0xff0000,
                 timestamp=datetime.now(ZoneInfo("UTC"))
             )
-            embed.add_field(name="Kullanıcı", value=self.user.mention)
+            embed.add_field(name="Kullanıcı", value=f"<@{badge.user_id}>")
             embed.add_field(name="Moderatör", value=modal_interaction.user.mention)
             embed.add_field(name="Sebep", value=reason)
-            embed.set_image(url=badge[3])
+            embed.set_image(url=badge.badge_url)
             embed.set_footer(text=f"Talep ID: {self.badge_id} | Habsen Topluluğu")
             await modal_interaction.followup.edit_message(message_id=modal_interaction.message.id, 
                                                         embed=embed, view=None)
@@ -339,10 +325,18 @@ class BadgeApprovalView(discord.ui.View):
         modal.on_submit = on_submit
         await interaction.response.send_modal(modal)
 
+class BadgeApprovalView(discord.ui.View):
+    def __init__(self, badge_id):
+        super().__init__(timeout=None)
+        self.add_item(BadgeReviewButton("approve", badge_id))
+        self.add_item(BadgeReviewButton("reject", badge_id))
+
 class Ticket(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.badge_repo = BadgeRepo(bot.db)
         self.pending_badge_requests = {}
+        self.archive_badges.start()
         self.TICKET_SYSTEMS = {
             "rozetbilgilendirme": {
                 "name": "Rozet Bilgilendirme",
@@ -364,6 +358,23 @@ class Ticket(commands.Cog):
             }
         }
 
+    async def cog_load(self):
+        # Bekleyen tüm rozet taleplerinin butonları tek kayıtla bağlanır
+        self.bot.add_dynamic_items(BadgeReviewButton)
+        # Yeniden başlatmada açık kalan yükleme süreleri geri yüklenir
+        timers = await self.bot.timers.register("badge_window", self.expire_badge_window)
+        for timer in timers:
+            self.pending_badge_requests[int(timer.key)] = timer.due
+
+    async def cog_unload(self):
+        self.bot.remove_dynamic_items(BadgeReviewButton)
+        self.archive_badges.cancel()
+
+    async def expire_badge_window(self, timer):
+        user_id = int(timer.key)
+        if self.pending_badge_requests.get(user_id) == timer.due:
+            del self.pending_badge_requests[user_id]
+
     async def check_owner(self, interaction: discord.Interaction):
         if interaction.user.id != interaction.guild.owner_id:
             embed = discord.Embed(
@@ -432,7 +443,7 @@ class Ticket(commands.Cog):
                     timestamp=datetime.now(ZoneInfo("UTC"))
                 )
                 embed.set_footer(text=system["embed"]["footer"])
-                view = BadgeRequestView(self.pending_badge_requests)
+                view = BadgeRequestView(self.pending_badge_requests, self.badge_repo)
                 message = await channel.send(embed=embed, view=view)
                 interaction.client.persistent_views[message.id] = view
 
@@ -493,6 +504,12 @@ class Ticket(commands.Cog):
         embed.set_footer(text="Habsen Topluluğu")
         await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
+    @tasks.loop(hours=1)
+    async def archive_badges(self):
+        # Saatlik talep sınırı submitted_at'e baktığı için saklama süresi en az bir saat tutulur
+        retention = max(int(os.getenv("BADGE_RETENTION_DAYS", "7")) * 86400, 3600)
+        await self.badge_repo.archive_reviewed(epoch() - retention)
+
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
         if message.author.bot or message.channel_id != int(os.getenv("BADGE_REQUEST_CHANNEL_ID")):
@@ -509,16 +526,11 @@ class Ticket(commands.Cog):
                 timestamp=datetime.now(ZoneInfo("UTC"))
             )
             embed.set_footer(text="Habsen Topluluğu")
-            await message.author.send(embed=embed)
+            dm_dispatcher.send(message.author, embed)
             return
 
-        async with aiosqlite.connect("warnings.db") as db:
-            cursor = await db.execute('''
-                SELECT COUNT(*) FROM badges 
-                WHERE user_id = ? AND guild_id = ? AND submitted_at > ?
-            ''', (message.author.id, message.guild.id, 
-                  (datetime.now(ZoneInfo("UTC")) - timedelta(hours=1)).isoformat()))
-            request_count = (await cursor.fetchone())[0]
+        request_count = await self.badge_repo.count_recent(message.author.id, message.guild.id,
+                                                          epoch(datetime.now(ZoneInfo("UTC")) - timedelta(hours=1)))
 
         if request_count >= 3:
             await message.delete()
@@ -529,7 +541,7 @@ class Ticket(commands.Cog):
                 timestamp=datetime.now(ZoneInfo("UTC"))
             )
             embed.set_footer(text="Habsen Topluluğu")
-            await message.author.send(embed=embed)
+            dm_dispatcher.send(message.author, embed)
             return
 
         if not message.attachments or not any(attachment.content_type in ['image/png', 'image/jpeg'] for attachment in message.attachments):
@@ -541,21 +553,14 @@ class Ticket(commands.Cog):
                 timestamp=datetime.now(ZoneInfo("UTC"))
             )
             embed.set_footer(text="Habsen Topluluğu")
-            await message.author.send(embed=embed)
+            dm_dispatcher.send(message.author, embed)
             return
 
         attachment = message.attachments[0]
         badge_url = attachment.url
         await message.delete()
 
-        async with aiosqlite.connect("warnings.db") as db:
-            cursor = await db.execute('''
-                INSERT INTO badges (user_id, guild_id, badge_url, status, submitted_at)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (message.author.id, message.guild.id, badge_url, 'pending', 
-                  datetime.now(ZoneInfo("UTC")).isoformat()))
-            await db.commit()
-            badge_id = cursor.lastrowid
+        badge_id = await self.badge_repo.add(message.author.id, message.guild.id, badge_url, epoch())
 
         log_channel = message.guild.get_channel(int(os.getenv("BADGE_MOD_LOG_CHANNEL_ID")))
         if log_channel:
@@ -567,13 +572,9 @@ class Ticket(commands.Cog):
             )
             embed.set_image(url=badge_url)
             embed.set_footer(text=f"Talep ID: {badge_id} | Habsen Topluluğu")
-            view = BadgeApprovalView(badge_id, message.author)
-            log_message = await log_channel.send(embed=embed, view=view)
-            self.bot.persistent_views[log_message.id] = view
+            log_message = await log_channel.send(embed=embed, view=BadgeApprovalView(badge_id))
 
-            async with aiosqlite.connect("warnings.db") as db:
-                await db.execute('UPDATE badges SET message_id = ? WHERE id = ?', (log_message.id, badge_id))
-                await db.commit()
+            await self.badge_repo.set_message(message.guild.id, badge_id, log_message.id)
 
         embed = discord.Embed(
             title="Rozet Talebi Gönderildi",
@@ -586,9 +587,11 @@ class Ticket(commands.Cog):
             timestamp=datetime.now(ZoneInfo("UTC"))
         )
         embed.set_footer(text="Habsen Topluluğu")
-        await message.author.send(embed=embed)
+        dm_dispatcher.send(message.author, embed)
 
-        del self.pending_badge_requests[message.author.id]
+        # Süre bu sırada dolduysa kayıt zamanlayıcı tarafından silinmiş olabilir
+        self.pending_badge_requests.pop(message.author.id, None)
+        await self.bot.timers.cancel("badge_window", message.author.id, message.guild.id)
 
     @commands.Cog.listener()
     async def on_ready(self):
@@ -597,47 +600,10 @@ class Ticket(commands.Cog):
         if request_channel:
             async for message in request_channel.history(limit=100):
                 if message.author == self.bot.user and "Rozet Talebi" in message.embeds[0].title:
-                    view = BadgeRequestView(self.pending_badge_requests)
+                    view = BadgeRequestView(self.pending_badge_requests, self.badge_repo)
                     self.bot.persistent_views[message.id] = view
                     await message.edit(view=view)
                     break
 
-        log_channel = self.bot.get_channel(int(os.getenv("BADGE_MOD_LOG_CHANNEL_ID")))
-        if log_channel:
-            async with aiosqlite.connect("warnings.db") as db:
-                cursor = await db.execute('SELECT id, user_id, message_id FROM badges WHERE status = ?', ('pending',))
-                pending_badges = await cursor.fetchall()
-
-            for badge in pending_badges:
-                badge_id, user_id, message_id = badge
-                try:
-                    user = await self.bot.fetch_user(user_id)
-                    message = await log_channel.fetch_message(message_id)
-                    view = BadgeApprovalView(badge_id, user)
-                    self.bot.persistent_views[message_id] = view
-                    await message.edit(view=view)
-                except discord.NotFound:
-                    embed = discord.Embed(
-                        title="Yeni Rozet Talebi",
-                        description=f"<@{user_id}> tarafından yeni bir rozet talebi gönderildi.",
-                        color=0xffff00,
-                        timestamp=datetime.now(ZoneInfo("UTC"))
-                    )
-                    async with aiosqlite.connect("warnings.db") as db:
-                        cursor = await db.execute('SELECT badge_url FROM badges WHERE id = ?', (badge_id,))
-                        badge_url = (await cursor.fetchone())[0]
-                    embed.set_image(url=badge_url)
-                    embed.set_footer(text=f"Talep ID: {badge_id} | Habsen Topluluğu")
-                    view = BadgeApprovalView(badge_id, user)
-                    new_message = await log_channel.send(embed=embed, view=view)
-                    async with aiosqlite.connect("warnings.db") as db:
-                        await db.execute('UPDATE badges SET message_id = ? WHERE id = ?', (new_message.id, badge_id))
-                        await db.commit()
-                    self.bot.persistent_views[new_message.id] = view
-                except Exception as e:
-                    from utils.helpers import log_error_to_discord
-                    logger.error(f"Rozet talebi yeniden bağlanırken hata (badge_id: {badge_id}): {str(e)}")
-                    await log_error_to_discord(f"Rozet talebi yeniden bağlanırken hata (badge_id: {badge_id}): {str(e)}")
-
 async def setup(bot):
     await bot.add_cog(Ticket(bot))
@@ -0,0 +1,85 @@
+import asyncio
+import json
+import logging
+from repositories import Record
+from scheduler import DeadlineScheduler
+
+logger = logging.getLogger("HabsenBot")
+
+UPSERT_TIMER = '''
+    INSERT OR REPLACE INTO timers (kind, key, guild_id, due, payload)
+    VALUES (?, ?, ?, ?, ?)
+'''
+SELECT_TIMERS = 'SELECT id, key, guild_id, due, payload FROM timers WHERE kind = ?'
+CLAIM_TIMER = 'DELETE FROM timers WHERE id = ? AND due = ? RETURNING payload'
+DELETE_TIMER = 'DELETE FROM timers WHERE kind = ? AND guild_id = ? AND key = ?'
+
+class Timer(Record):
+    __slots__ = ("id", "kind", "key", "guild_id", "due", "payload")
+
+class TimerService:
+    # Kalıcı zamanlayıcılar: kayıt sunucunun veritabanındaki timers tablosunda, sıra bellekteki
+    # DeadlineScheduler yığınında tutulur. Bir tür register() ile işleyicisini bağladığında o türün
+    # kayıtları yüklenir; süresi yeniden başlatma sırasında dolmuş olanlar hemen çalışır.
+    # Her zamanlayıcı çalışmadan önce satırı silinerek sahiplenilir, iptal ve yenilenenler atlanır
+    def __init__(self, storage):
+        self.storage = storage
+        self.handlers = {}
+        self.scheduler = DeadlineScheduler(self._fire, "Zamanlayıcı servisi")
+        self.failed = 0
+
+    async def register(self, kind, handler):
+        # Yüklenen zamanlayıcılar döner; çağıran taraf bellekteki durumunu bunlardan kurabilir
+        self.handlers[kind] = handler
+        timers = []
+        async for db in self.storage.shards():
+            for timer_id, key, guild_id, due, payload in await db.fetchall(SELECT_TIMERS, (kind,)):
+                timers.append(Timer(timer_id, kind, key, guild_id, due, json.loads(payload) if payload else None))
+        for timer in timers:
+            self.scheduler.schedule(timer.due, timer)
+        self.scheduler.start()
+        return timers
+
+    async def schedule(self, kind, key, guild_id, due, payload=None):
+        # Aynı sunucuda aynı (kind, key) için bekleyen zamanlayıcının yerini alır
+        db = await self.storage.for_guild(guild_id)
+        result = await db.execute(UPSERT_TIMER, (kind, str(key), guild_id, due,
+                                                 json.dumps(payload) if payload is not None else None))
+        self.scheduler.schedule(due, Timer(result.lastrowid, kind, str(key), guild_id, due, payload))
+        return result.lastrowid
+
+    async def cancel(self, kind, key, guild_id):
+        # Yığındaki kayıt yerinde kalır; zamanı geldiğinde satırı bulunamadığı için atlanır
+        db = await self.storage.for_guild(guild_id)
+        result = await db.execute(DELETE_TIMER, (kind, guild_id, str(key)))
+        return result.rowcount > 0
+
+    async def _claim(self, timer):
+        async def job(db):
+            cursor = await db.execute(CLAIM_TIMER, (timer.id, timer.due))
+            return await cursor.fetchone() is not None
+        db = await self.storage.for_guild(timer.guild_id)
+        return await db.write(job)
+
+    async def _run(self, timer):
+        handler = self.handlers.get(timer.kind)
+        if handler is None or not await self._claim(timer):
+            return
+        try:
+            await handler(timer)
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Zamanlayıcı işleyicisi hata verdi ({timer.kind}:{timer.key}): {str(e)}")
+
+    async def _fire(self, timers):
+        await asyncio.gather(*(self._run(timer) for timer in timers))
+
+    async def stop(self):
+        await self.scheduler.stop()
+
+    def stats(self):
+        return {
+            "bekleyen": len(self.scheduler),
+            "çalışan": self.scheduler.fired,
+            "hatalı": self.failed,
+        }